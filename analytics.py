@@ -0,0 +1,133 @@
+# ==========================
+# analytics.py
+# ==========================
+# Panel de analítica del admin (/admin/analytics): clientes por estado de
+# suscripción, altas por semana y rutinas/ejercicios por entrenador.
+#
+# Todo se lee de las tablas stat_* (models.py), que se actualizan en la
+# misma transacción que cada escritura, así el panel no recorre user,
+# routine ni exercise. rebuild_counters() las recalcula desde cero: la usa
+# la migración 0013 y la tarea semanal rebuild_analytics_counters, que
+# corrige cualquier diferencia (p. ej. filas cargadas por fuera de la app).
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, case, delete, func, insert, select
+
+from models import (db, User, Routine, Exercise, SignupDaily, SubscriptionEndDaily, CoachStats,
+                    EXPIRING_DAYS, NO_SUBSCRIPTION_DAY, SUBSCRIPTION_STATUSES,
+                    bump_coach_counters, bump_member_counters)
+
+
+SIGNUP_WEEKS = 12
+TOP_COACHES = 50
+
+
+# ---------------------- CONSULTAS ----------------------
+def subscription_status_counts(within_days=EXPIRING_DAYS, today=None):
+    """Lo mismo que models.subscription_counts, pero sumando una fila por
+    fecha de vencimiento en vez de una por cliente."""
+    today = today or date.today()
+    limit = today + timedelta(days=within_days)
+    day, members = SubscriptionEndDaily.day, SubscriptionEndDaily.members
+    conditions = {
+        'active': day > limit,
+        'expiring': and_(day > today, day <= limit),
+        'expired': and_(day > NO_SUBSCRIPTION_DAY, day <= today),
+        'none': day == NO_SUBSCRIPTION_DAY,
+    }
+    columns = [func.coalesce(func.sum(case((conditions[s], members), else_=0)), 0)
+               for s in SUBSCRIPTION_STATUSES]
+    row = db.session.query(*columns).one()
+    return dict(zip(SUBSCRIPTION_STATUSES, (int(v) for v in row)))
+
+
+def signups_per_week(weeks=SIGNUP_WEEKS, today=None):
+    """Altas de las últimas `weeks` semanas (la última termina hoy), de la
+    más antigua a la más reciente."""
+    today = today or datetime.utcnow().date()
+    start = today - timedelta(days=7 * weeks - 1)
+    buckets = [0] * weeks
+    rows = (db.session.query(SignupDaily.day, SignupDaily.members)
+            .filter(SignupDaily.day >= start, SignupDaily.day <= today))
+    for day, members in rows:
+        buckets[(day - start).days // 7] += members
+    return [{'desde': (start + timedelta(days=7 * i)).isoformat(),
+             'hasta': (start + timedelta(days=7 * i + 6)).isoformat(),
+             'altas': n} for i, n in enumerate(buckets)]
+
+
+def coach_volume(limit=TOP_COACHES):
+    return (CoachStats.query
+            .filter((CoachStats.routines > 0) | (CoachStats.exercises > 0))
+            .order_by(CoachStats.routines.desc(), CoachStats.exercises.desc(), CoachStats.coach)
+            .limit(limit)
+            .all())
+
+
+def analytics_summary(within_days=EXPIRING_DAYS, weeks=SIGNUP_WEEKS, today=None):
+    """Datos del panel: tres consultas sobre las tablas stat_*."""
+    counts = subscription_status_counts(within_days, today)
+    signups = signups_per_week(weeks, today)
+    return {
+        'clientes': sum(counts.values()),
+        'suscripciones': counts,
+        'altas_semana': signups[-1]['altas'],
+        'altas_por_semana': signups,
+        'entrenadores': [{'nombre': c.coach, 'rutinas': c.routines, 'ejercicios': c.exercises}
+                         for c in coach_volume()],
+    }
+
+
+# ---------------------- MANTENIMIENTO ----------------------
+def forget_members(user_ids):
+    """Descuenta de los contadores a clientes (con sus rutinas y ejercicios)
+    que se van a borrar con DELETE directos, que no pasan por el ORM."""
+    connection = db.session.connection()
+    signups, ends = {}, {}
+    rows = (db.session.query(User.created_at, User.subscription_end)
+            .filter(User.id.in_(user_ids), User.role != 'admin'))
+    for created_at, end in rows:
+        day = (created_at or datetime.utcnow()).date()
+        signups[day] = signups.get(day, 0) - 1
+        ends[end] = ends.get(end, 0) - 1
+    bump_member_counters(connection, signups, ends)
+
+    coach = func.coalesce(Routine.creado_por, '')
+    rows = (db.session.query(coach, func.count(func.distinct(Routine.id)), func.count(Exercise.id))
+            .outerjoin(Exercise, Exercise.rutina_id == Routine.id)
+            .filter(Routine.user_id.in_(user_ids))
+            .group_by(coach))
+    for name, routines, exercises in rows:
+        bump_coach_counters(connection, name, routines=-routines, exercises=-exercises)
+
+
+def rebuild_counters():
+    """Recalcula todas las tablas stat_* desde user, routine y exercise.
+    El commit lo hace quien llama."""
+    # Solo las columnas que usa: la migración 0013 corre antes de que existan
+    # columnas de user agregadas después
+    members = (select(User.created_at, User.subscription_end)
+               .where(User.role != 'admin').subquery())
+    signup_day = func.date(members.c.created_at)
+    end_day = func.coalesce(members.c.subscription_end, NO_SUBSCRIPTION_DAY)
+
+    db.session.execute(delete(SignupDaily))
+    db.session.execute(insert(SignupDaily).from_select(
+        ['day', 'members'],
+        select(signup_day, func.count()).where(members.c.created_at.isnot(None)).group_by(signup_day)))
+
+    db.session.execute(delete(SubscriptionEndDaily))
+    db.session.execute(insert(SubscriptionEndDaily).from_select(
+        ['day', 'members'],
+        select(end_day, func.count()).group_by(end_day)))
+
+    per_routine = (select(Exercise.rutina_id, func.count().label('exercises'))
+                   .group_by(Exercise.rutina_id).subquery())
+    coach = func.coalesce(Routine.creado_por, '')
+    db.session.execute(delete(CoachStats))
+    db.session.execute(insert(CoachStats).from_select(
+        ['coach', 'routines', 'exercises'],
+        select(coach, func.count(Routine.id), func.coalesce(func.sum(per_routine.c.exercises), 0))
+        .outerjoin(per_routine, per_routine.c.rutina_id == Routine.id)
+        .group_by(coach)))
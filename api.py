@@ -0,0 +1,205 @@
+# ==========================
+# api.py
+# ==========================
+# API JSON de solo lectura para la app móvil (/api/v1).
+#
+#   GET /api/v1/me/routines                 rutinas del usuario
+#   GET /api/v1/me/routines/changes?since=  solo lo que cambió desde `since`
+#   GET /api/v1/routines/<rid>              una rutina con sus ejercicios
+#
+# Parámetros comunes: fields=id,titulo,...  y  exercise_fields=nombre,series,...
+# Las respuestas llevan ETag (304 con If-None-Match) y se comprimen con
+# brotli (si está instalado) o gzip según Accept-Encoding.
+
+import gzip
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+from flask import Blueprint, Response, abort, g, jsonify, request
+from flask_login import current_user, login_required
+
+from models import Routine, get_routine_or_404, user_routines_fingerprint, user_routines_query
+
+try:
+    import brotli
+except ImportError:  # dependencia opcional
+    brotli = None
+
+
+api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+ROUTINE_FIELDS = ('id', 'titulo', 'descripcion', 'fecha_creacion', 'creado_por', 'version',
+                  'updated_at', 'exercises')
+DEFAULT_LIST_FIELDS = ('id', 'titulo', 'fecha_creacion', 'creado_por', 'version', 'updated_at')
+EXERCISE_FIELDS = ('id', 'template_exercise_id', 'nombre', 'series', 'repeticiones', 'peso', 'dia', 'notas')
+COMPRESS_MIN_BYTES = 512
+# Margen para no perder cambios de transacciones que hicieron commit
+# mientras se respondía la consulta anterior
+DELTA_OVERLAP = timedelta(seconds=5)
+
+
+# ---------------------- SERIALIZACIÓN ----------------------
+def _parse_fields(name, allowed, default):
+    raw = request.args.get(name)
+    if not raw:
+        return tuple(default)
+    fields = tuple(f.strip() for f in raw.split(',') if f.strip())
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        abort(400, description=f'Campos desconocidos en {name}: {", ".join(unknown)}')
+    return fields
+
+
+def _compact(value):
+    if isinstance(value, datetime):
+        return value.isoformat(timespec='seconds')
+    return value
+
+
+def exercise_to_dict(e, fields):
+    data = {}
+    for field in fields:
+        if field == 'id':
+            value = None if e.from_template else e.id
+        elif field == 'template_exercise_id':
+            value = e.id if e.from_template else e.template_exercise_id
+        else:
+            value = getattr(e, field)
+        if value not in (None, ''):
+            data[field] = _compact(value)
+    return data
+
+
+def routine_to_dict(r, fields, exercise_fields):
+    data = {}
+    for field in fields:
+        if field == 'exercises':
+            data['exercises'] = [exercise_to_dict(e, exercise_fields) for e in r.resolved_exercises()]
+            continue
+        value = getattr(r, field)
+        if value not in (None, ''):
+            data[field] = _compact(value)
+    return data
+
+
+# ---------------------- ETAG Y COMPRESIÓN ----------------------
+def _etag(*parts):
+    key = repr((current_user.id,) + parts + (request.query_string,))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _not_modified(etag):
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+    return None
+
+
+def _json(payload, etag):
+    response = jsonify(payload)
+    # Débil porque el cuerpo cambia según la compresión negociada
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@api_v1.after_request
+def compress(response):
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.content_length is None or response.content_length < COMPRESS_MIN_BYTES):
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        response.set_data(brotli.compress(response.get_data(), quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+@api_v1.before_request
+def use_read_replica():
+    g.use_read_replica = True
+
+
+@api_v1.errorhandler(400)
+@api_v1.errorhandler(401)
+@api_v1.errorhandler(403)
+@api_v1.errorhandler(404)
+def json_error(error):
+    return jsonify({'ok': False, 'error': error.description}), error.code
+
+
+# ---------------------- ENDPOINTS ----------------------
+@api_v1.route('/me/routines')
+@login_required
+def me_routines():
+    fields = _parse_fields('fields', ROUTINE_FIELDS, DEFAULT_LIST_FIELDS)
+    exercise_fields = _parse_fields('exercise_fields', EXERCISE_FIELDS, EXERCISE_FIELDS)
+
+    etag = _etag('me_routines', user_routines_fingerprint(current_user.id))
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+
+    routines = user_routines_query(current_user.id, with_exercises='exercises' in fields).all()
+    return _json({'routines': [routine_to_dict(r, fields, exercise_fields) for r in routines]}, etag)
+
+
+@api_v1.route('/me/routines/changes')
+@login_required
+def me_routine_changes():
+    """Rutinas creadas o modificadas desde `since` (ISO 8601, UTC).
+
+    Devuelve además los ids vigentes para que la app borre las rutinas que
+    ya no existen, y `next_since` para la siguiente consulta.
+    """
+    fields = _parse_fields('fields', ROUTINE_FIELDS, ROUTINE_FIELDS)
+    exercise_fields = _parse_fields('exercise_fields', EXERCISE_FIELDS, EXERCISE_FIELDS)
+    try:
+        since = datetime.fromisoformat(request.args['since'])
+    except (KeyError, ValueError):
+        abort(400, description='Parámetro "since" obligatorio en formato ISO 8601.')
+    # updated_at se guarda en UTC sin zona: un `since` con offset se convierte
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+
+    # Con 304 la app conserva su `since` anterior, que sigue siendo válido
+    etag = _etag('changes', user_routines_fingerprint(current_user.id))
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+
+    next_since = datetime.utcnow() - DELTA_OVERLAP
+    changed = (user_routines_query(current_user.id, with_exercises='exercises' in fields)
+               .filter(Routine.updated_at > since)
+               .all())
+    ids = [rid for (rid,) in user_routines_query(current_user.id).with_entities(Routine.id)]
+
+    return _json({
+        'changed': [routine_to_dict(r, fields, exercise_fields) for r in changed],
+        'ids': ids,
+        'next_since': next_since.isoformat(timespec='seconds'),
+    }, etag)
+
+
+@api_v1.route('/routines/<int:rid>')
+@login_required
+def routine_detail(rid):
+    fields = _parse_fields('fields', ROUTINE_FIELDS, ROUTINE_FIELDS)
+    exercise_fields = _parse_fields('exercise_fields', EXERCISE_FIELDS, EXERCISE_FIELDS)
+
+    r = get_routine_or_404(rid, with_exercises='exercises' in fields)
+    if r.user_id != current_user.id and not current_user.is_admin():
+        abort(403)
+
+    etag = _etag('routine', r.id, r.version)
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+    return _json(routine_to_dict(r, fields, exercise_fields), etag)
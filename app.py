@@ -1,32 +1,173 @@
-import os
+import io
 import json
+import hashlib
+import os
+import queue
 from datetime import datetime, date
-from flask import Flask, render_template, redirect, url_for, flash, request, abort, jsonify
+from flask import (Flask, Response, render_template, redirect, url_for, flash, request, abort, jsonify, g,
+                   session, stream_with_context)
+from markupsafe import Markup
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash
 
-from models import db, User, Routine, Exercise
-from forms import RegisterForm, LoginForm, RoutineForm, ExerciseForm, RoutineWithExercisesForm
+from models import (db, User, Routine, Exercise, CheckIn, CheckInMember, search_users,
+                    SUBSCRIPTION_STATUSES, EXPIRING_DAYS, users_by_subscription_status, subscription_counts,
+                    get_user_routines, get_routine_or_404, user_routines_fingerprint, start_counting, stop_counting,
+                    create_routines, active_member_ids, RoutineTemplate, TemplateExercise,
+                    create_template, assign_template, override_template_exercise,
+                    add_exercise, apply_exercise_changes, visible_exercise_count, install_sqlite_pragmas)
+from config import load_config, engine_options
+from cache import make_cache
+from member_io import detect_format, export_lines, import_members, read_rows
+from cli import nova_cli
+from api import api_v1
+from assets import init_assets
+from metrics import init_metrics
+from passwords import HasherBusy, PasswordHasher, RateLimiter
+from analytics import analytics_summary
+from checkins import CheckInWriter, checkin_stats, member_for_checkin, write_checkins
+from jobs import start_in_process_worker
+from notifications import make_transport
+from forms import (RegisterForm, LoginForm, RoutineForm, ExerciseForm, RoutineWithExercisesForm,
+                   MAX_EXERCISES_PER_ROUTINE, parse_exercise, parse_exercises_payload, parse_exercise_changes)
 
 
 # -------------------------- APP FACTORY --------------------------
-def create_app():
+def create_app(config=None):
     app = Flask(__name__, template_folder='templates', static_folder='static')
 
-    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'nova-secret-key')
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///gym.db'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Variables de entorno (config.py) y, encima, lo que pase quien crea la app
+    app.config.from_mapping(load_config())
+    if config:
+        app.config.from_mapping(config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+
+    # Máximo de consultas SQL por endpoint; al activar SQL_QUERY_BUDGET_ENFORCE
+    # (p. ej. en pruebas) una vista que se pase del límite lanza un error.
+    app.config.setdefault('SQL_QUERY_BUDGET_ENFORCE', False)
+    # Agrega la cabecera X-SQL-Queries a cada respuesta (bench_load.py)
+    app.config.setdefault('SQL_QUERY_COUNT_HEADER', False)
+    app.config.setdefault('SQL_QUERY_BUDGETS', {
+        'dashboard': 3,
+        'mis_rutinas': 3,
+        'view_routine': 5,
+        'admin_user_detail': 3,
+        'admin_analytics': 4,
+        'admin_edit_routine': 5,
+        # Usuario, huella del ETag, rutinas, ejercicios y (si hay rutinas de
+        # plantilla) plantillas y sus ejercicios; changes suma la lista de ids
+        'api_v1.me_routines': 6,
+        'api_v1.me_routine_changes': 7,
+        'api_v1.routine_detail': 5,
+    })
+
+    if app.config.get('PROXY_FIX_X_FOR'):
+        # Detrás de un proxy: la IP real del cliente (límite de intentos por IP)
+        # y el esquema vienen en X-Forwarded-*; solo se confía en N saltos
+        hops = app.config['PROXY_FIX_X_FOR']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
 
     db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            install_sqlite_pragmas(engine, app.config.get('SQLITE_PRAGMAS'))
+    app.cli.add_command(nova_cli)
+    app.register_blueprint(api_v1)
+    init_assets(app)
+    init_metrics(app)
 
     # ------------------------ LOGIN MANAGER ------------------------
     login_manager = LoginManager()
     login_manager.login_view = 'index'
+    # La API responde 401 en JSON en vez de redirigir al login
+    login_manager.blueprint_login_views['api_v1'] = None
     login_manager.init_app(app)
 
+    # Hash de contraseñas en un pool de procesos y límite de intentos de login
+    hasher = PasswordHasher(method=app.config['PASSWORD_HASH_METHOD'],
+                            salt_length=app.config['PASSWORD_SALT_LENGTH'],
+                            workers=app.config['PASSWORD_HASH_WORKERS'],
+                            max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+                            timeout=app.config['PASSWORD_HASH_TIMEOUT'])
+    app.extensions['nova_hasher'] = hasher
+    rate_cache = make_cache(app.config['RATE_LIMIT_BACKEND'], maxsize=100000,
+                            ttl=app.config['LOGIN_RATE_WINDOW'])
+    email_limiter = RateLimiter(rate_cache, app.config['LOGIN_RATE_LIMIT_EMAIL'], app.config['LOGIN_RATE_WINDOW'])
+    ip_limiter = RateLimiter(rate_cache, app.config['LOGIN_RATE_LIMIT_IP'], app.config['LOGIN_RATE_WINDOW'])
+
+    checkin_writer = CheckInWriter(app, batch_size=app.config['CHECKIN_BATCH_SIZE'],
+                                   flush_interval=app.config['CHECKIN_FLUSH_MS'] / 1000,
+                                   buffered=app.config['CHECKIN_BUFFERED'])
+    app.extensions['nova_checkins'] = checkin_writer
+
+    # Transporte de avisos (WhatsApp, log o el stub de pruebas)
+    app.extensions['nova_notifier'] = make_transport(app.config['NOTIFY_TRANSPORT'], app.config)
+    if app.config['JOBS_IN_PROCESS']:
+        # El hilo nace con la primera petición, ya dentro del worker
+        app.before_request(lambda: start_in_process_worker(app))
+
+    # Caché de identidad: evita leer el usuario de la base en cada petición.
+    # Se invalida sola al hacer commit de cambios sobre User (ver models.py).
+    user_cache = make_cache(app.config['USER_CACHE_BACKEND'],
+                            maxsize=app.config['USER_CACHE_SIZE'],
+                            ttl=app.config['USER_CACHE_TTL'])
+    app.extensions['nova_user_cache'] = user_cache
+
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        user_id = int(user_id)
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return User.from_cache(cached)
+
+        user = db.session.get(User, user_id)
+        if user is not None:
+            user_cache.set(user_id, user.to_cache())
+        return user
+
+    # ---------------------- CACHÉ DE FRAGMENTOS ----------------------
+    # Las claves incluyen la versión de la rutina: al editarla cambia la
+    # clave y la entrada vieja simplemente deja de usarse.
+    fragment_cache = make_cache(app.config['FRAGMENT_CACHE_BACKEND'],
+                                maxsize=app.config['FRAGMENT_CACHE_SIZE'],
+                                ttl=app.config['FRAGMENT_CACHE_TTL'])
+    app.extensions['nova_fragment_cache'] = fragment_cache
+
+    # ------------------------ ETAG / 304 ------------------------
+    # Cambia cuando se despliegan plantillas nuevas, para no servir 304 de
+    # páginas con el HTML anterior.
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    template_stamp = ''.join(
+        f'{name}:{os.path.getmtime(os.path.join(template_dir, name))};'
+        for name in sorted(os.listdir(template_dir)) if name.endswith('.html'))
+    # Las URLs de los estáticos cambian al regenerar static/dist/
+    template_stamp += json.dumps(app.extensions['nova_assets'], sort_keys=True)
+
+    def page_etag(*parts):
+        # La barra de navegación muestra el nombre y el rol del usuario
+        key = repr((template_stamp, current_user.id, current_user.nombre, current_user.role) + parts)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def not_modified(etag, last_modified=None):
+        """Respuesta 304 si el navegador ya tiene esta versión de la página."""
+        if session.get('_flashes'):
+            return None  # hay mensajes pendientes que mostrar
+        if request.if_none_match:
+            matched = request.if_none_match.contains(etag)
+        elif last_modified is not None and request.if_modified_since is not None:
+            matched = last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+        else:
+            matched = False
+        if not matched:
+            return None
+        return conditional(Response(status=304), etag, last_modified)
+
+    def conditional(response, etag, last_modified=None):
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
 
     # ------------------------ ADMIN REQUIRED ------------------------
     def admin_required(f):
@@ -38,21 +179,59 @@ def create_app():
             return f(*args, **kwargs)
         return decorated
 
-    # ---------------------- CREATE TABLES + ADMIN ----------------------
-    with app.app_context():
-        db.create_all()
-
-        admin_email = os.environ.get('ADMIN_EMAIL', 'andresnova@gmail.com')
-        admin_password = os.environ.get('ADMIN_PASSWORD', '123456')
-        admin_nombre = os.environ.get('ADMIN_NOMBRE', 'Administrador')
-
-        existing_admin = User.query.filter_by(email=admin_email).first()
-        if not existing_admin:
-            admin = User(nombre=admin_nombre, email=admin_email, role='admin')
-            admin.password_hash = generate_password_hash(admin_password)
-            db.session.add(admin)
-            db.session.commit()
-            print(f"Admin creado: {admin_email} / {admin_password}")
+    # ------------------ IDS DE USUARIOS EN PAYLOAD JSON ------------------
+    def parse_member_ids(data, errors):
+        user_ids = data.get('user_ids')
+        if not isinstance(user_ids, list) or not user_ids:
+            errors.append('"user_ids" debe ser una lista no vacía.')
+            return []
+        if not all(isinstance(uid, int) and not isinstance(uid, bool) for uid in user_ids):
+            errors.append('"user_ids" solo admite enteros.')
+            return []
+        user_ids = list(dict.fromkeys(user_ids))
+
+        inactive = set(user_ids) - active_member_ids(user_ids)
+        if inactive:
+            errors.append('Usuarios inexistentes o sin suscripción activa: '
+                          + ', '.join(str(uid) for uid in sorted(inactive)))
+        return user_ids
+
+    # ---------------------- PRESUPUESTO DE CONSULTAS ----------------------
+    @app.before_request
+    def start_query_budget():
+        if app.config['SQL_QUERY_BUDGET_ENFORCE'] or app.config['SQL_QUERY_COUNT_HEADER']:
+            g.query_counter = start_counting()
+
+    @app.after_request
+    def check_query_budget(response):
+        counter = g.pop('query_counter', None)
+        if counter is None:
+            return response
+        stop_counting(counter)
+        if app.config['SQL_QUERY_COUNT_HEADER']:
+            response.headers['X-SQL-Queries'] = str(counter.count)
+
+        budget = app.config['SQL_QUERY_BUDGETS'].get(request.endpoint)
+        if app.config['SQL_QUERY_BUDGET_ENFORCE'] and budget is not None and counter.count > budget:
+            raise AssertionError(
+                f'{request.endpoint} ejecutó {counter.count} consultas SQL (máximo {budget}):\n'
+                + '\n'.join(counter.statements))
+        return response
+
+    @app.teardown_request
+    def stop_query_budget(exc):
+        counter = g.pop('query_counter', None)
+        if counter is not None:
+            stop_counting(counter)
+
+    # ------------------------ RÉPLICA DE LECTURA ------------------------
+    def read_replica(f):
+        from functools import wraps
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            g.use_read_replica = True
+            return f(*args, **kwargs)
+        return decorated
 
     # ---------------------- TEMPLATE FILTERS ----------------------
     @app.template_filter('nl2br')
@@ -78,13 +257,37 @@ def create_app():
         if request.method == 'POST':
             form_type = request.form.get('form-type')
 
+            # Se cuenta antes de calcular ningún hash: un ataque de fuerza
+            # bruta no llega a consumir CPU
+            if not ip_limiter.hit('ip', request.remote_addr):
+                flash('Demasiados intentos. Espera unos minutos.', 'danger')
+                return render_template('index.html', login_form=login_form, register_form=register_form), 429
+
             # -------- LOGIN --------
             if form_type == 'login':
                 email = request.form.get('email')
                 password = request.form.get('password')
-                user = User.query.filter_by(email=email).first()
 
-                if user and user.check_password(password):
+                if not email_limiter.hit('email', (email or '').strip().lower()):
+                    flash('Demasiados intentos. Espera unos minutos.', 'danger')
+                    return render_template('index.html', login_form=login_form, register_form=register_form), 429
+
+                user = User.query.filter_by(email=email).first()
+                try:
+                    valid = bool(user and password and hasher.verify(user.password_hash, password))
+                except HasherBusy:
+                    flash('El servidor está ocupado, intenta de nuevo en unos segundos.', 'warning')
+                    return render_template('index.html', login_form=login_form, register_form=register_form), 503
+
+                if valid:
+                    if hasher.needs_rehash(user.password_hash):
+                        # Los parámetros de hash cambiaron: se actualiza en silencio
+                        try:
+                            user.password_hash = hasher.hash(password)
+                            db.session.commit()
+                        except Exception:
+                            db.session.rollback()
+                    email_limiter.reset('email', email.strip().lower())
                     login_user(user)
                     flash('Inicio de sesión exitoso.', 'success')
                     return redirect(url_for('admin_dashboard' if user.is_admin() else 'dashboard'))
@@ -101,8 +304,14 @@ def create_app():
                 if User.query.filter_by(email=email).first():
                     flash('El correo ya está registrado.', 'warning')
                 else:
+                    try:
+                        password_hash = hasher.hash(password)
+                    except HasherBusy:
+                        flash('El servidor está ocupado, intenta de nuevo en unos segundos.', 'warning')
+                        return render_template('index.html', login_form=login_form,
+                                               register_form=register_form), 503
                     user = User(nombre=nombre, email=email, phone=phone)
-                    user.password_hash = generate_password_hash(password)
+                    user.password_hash = password_hash
                     db.session.add(user)
                     db.session.commit()
                     flash('Registro exitoso.', 'success')
@@ -124,11 +333,19 @@ def create_app():
     # ================================================================
     @app.route('/dashboard')
     @login_required
+    @read_replica
     def dashboard():
         if current_user.is_admin():
             return redirect(url_for('admin_dashboard'))
-        routines = Routine.query.filter_by(user_id=current_user.id).order_by(Routine.fecha_creacion.desc()).all()
-        return render_template('user_dashboard.html', routines=routines)
+        # Los días restantes cambian cada día aunque no cambie nada más
+        etag = page_etag('dashboard', date.today(), current_user.subscription_end,
+                         user_routines_fingerprint(current_user.id))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        routines = get_user_routines(current_user.id)
+        return conditional(app.make_response(render_template('user_dashboard.html', routines=routines)), etag)
 
 
     # ================================================================
@@ -138,21 +355,122 @@ def create_app():
     @login_required
     @admin_required
     def admin_dashboard():
-        users = User.query.filter(User.role != 'admin').order_by(User.created_at.desc()).all()
-        return render_template('admin_dashboard.html', users=users)
+        users, next_cursor = search_users()
+        return render_template('admin_dashboard.html', users=users, next_cursor=next_cursor)
+
+    # -------- BÚSQUEDA PAGINADA DE USUARIOS (JSON) --------
+    @app.route('/admin/users/search')
+    @login_required
+    @admin_required
+    def admin_users_search():
+        q = request.args.get('q', '')
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit', type=int)
+
+        try:
+            users, next_cursor = search_users(q, cursor, limit)
+        except ValueError:
+            return jsonify({'ok': False, 'error': 'Cursor inválido'}), 400
+
+        return jsonify({
+            'ok': True,
+            'users': [{
+                'id': u.id,
+                'nombre': u.nombre,
+                'email': u.email,
+                'phone': u.phone,
+                'client_id': u.client_id,
+                'created_at': u.created_at.strftime('%Y-%m-%d') if u.created_at else None,
+                'detail_url': url_for('admin_user_detail', user_id=u.id),
+                'delete_url': url_for('admin_user_delete', user_id=u.id),
+            } for u in users],
+            'next_cursor': next_cursor,
+        })
 
     @app.route('/admin/user/<int:user_id>')
     @login_required
     @admin_required
     def admin_user_detail(user_id):
         user = User.query.get_or_404(user_id)
-        routines = Routine.query.filter_by(user_id=user.id).order_by(Routine.fecha_creacion.desc()).all()
+        routines = get_user_routines(user.id)
         days_remaining = user.days_remaining()
         return render_template('admin_user_detail.html',
                                user=user,
                                routines=routines,
                                days_remaining=days_remaining)
 
+    # -------- IMPORTAR / EXPORTAR CLIENTES --------
+    @app.route('/admin/import', methods=['POST'])
+    @login_required
+    @admin_required
+    def admin_import_members():
+        upload = request.files.get('file')
+        fmt = detect_format(upload.filename) if upload else None
+        if not upload or fmt not in ('csv', 'jsonl', 'json'):
+            flash('Sube un archivo .csv, .jsonl o .json.', 'warning')
+            return redirect(url_for('admin_dashboard'))
+
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        try:
+            result = import_members(read_rows(stream, fmt))
+        except ValueError as exc:
+            db.session.rollback()
+            flash(f'Archivo inválido: {exc}', 'danger')
+            return redirect(url_for('admin_dashboard'))
+        except HasherBusy:
+            # Los lotes anteriores ya se guardaron; reimportar salta esos correos
+            db.session.rollback()
+            flash('El servidor está ocupado, vuelve a importar el archivo en unos minutos.', 'warning')
+            return redirect(url_for('admin_dashboard'))
+
+        flash(f'Importación: {result.created} creados, {len(result.duplicates)} correos repetidos, '
+              f'{len(result.errors)} filas con errores.', 'success' if not result.errors else 'warning')
+        return redirect(url_for('admin_dashboard'))
+
+    @app.route('/admin/export/<kind>.<fmt>')
+    @login_required
+    @admin_required
+    def admin_export(kind, fmt):
+        try:
+            lines = export_lines(kind, fmt)
+        except ValueError:
+            abort(404)
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        return Response(stream_with_context(lines), mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename=nova_{kind}.{fmt}',
+        })
+
+    # -------- ESTADO DE SUSCRIPCIONES --------
+    @app.route('/admin/subscriptions')
+    @login_required
+    @admin_required
+    def admin_subscriptions():
+        status = request.args.get('status', 'expiring')
+        if status not in SUBSCRIPTION_STATUSES:
+            abort(404)
+        days = request.args.get('days', EXPIRING_DAYS, type=int)
+        days = max(1, min(days, 365))
+        page = request.args.get('page', 1, type=int)
+
+        pagination = users_by_subscription_status(status, days).paginate(page=page, per_page=50, error_out=False)
+        counts = subscription_counts(days)
+        return render_template('admin_subscriptions.html',
+                               status=status,
+                               days=days,
+                               counts=counts,
+                               pagination=pagination)
+
+    # -------- ANALÍTICA --------
+    @app.route('/admin/analytics')
+    @login_required
+    @admin_required
+    def admin_analytics():
+        # Se lee de los contadores (analytics.py), no de las tablas completas
+        summary = analytics_summary()
+        if request.args.get('format') == 'json':
+            return jsonify(summary)
+        return render_template('admin_analytics.html', summary=summary)
+
     # -------- ACTUALIZACIÓN DE SUSCRIPCIÓN --------
     @app.route('/admin/user/<int:user_id>/subscription', methods=['POST'])
     @login_required
@@ -203,7 +521,12 @@ def create_app():
             flash('No puedes eliminar tu propia cuenta.', 'warning')
             return redirect(url_for('admin_dashboard'))
 
+        # Visitas de este proceso aún en la cola: se escriben antes de borrar
+        # (las de otros procesos las descarta write_checkins)
+        checkin_writer.flush()
         try:
+            CheckIn.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+            CheckInMember.query.filter_by(user_id=user.id).delete(synchronize_session=False)
             db.session.delete(user)
             db.session.commit()
             flash('Usuario eliminado correctamente.', 'info')
@@ -214,6 +537,45 @@ def create_app():
         return redirect(url_for('admin_dashboard'))
 
 
+    # ================================================================
+    #                     ASISTENCIA (RECEPCIÓN)
+    # ================================================================
+    @app.route('/admin/checkin', methods=['POST'])
+    @login_required
+    @admin_required
+    def admin_checkin():
+        data = request.get_json(silent=True) or request.form
+        client_id = str(data.get('client_id') or '').strip()
+        if not client_id:
+            return jsonify({'ok': False, 'errors': ['Falta el número de cliente.']}), 400
+
+        user, error = member_for_checkin(client_id)
+        if user is None:
+            return jsonify({'ok': False, 'errors': [error]}), 404
+        if error:
+            return jsonify({'ok': False, 'errors': [error], 'nombre': user.nombre,
+                            'subscription_end': user.subscription_end.isoformat() if user.subscription_end else None}), 403
+
+        try:
+            checkin_writer.submit(user.id)
+        except queue.Full:
+            # Cola llena (la base no da abasto): se escribe ya, sin lote
+            try:
+                write_checkins([(user.id, datetime.now())])
+            except Exception:
+                return jsonify({'ok': False, 'errors': ['No se pudo registrar la visita, intenta de nuevo.']}), 503
+        return jsonify({'ok': True, 'nombre': user.nombre, 'subscription_end': user.subscription_end.isoformat(),
+                        'days_remaining': user.days_remaining()}), 202
+
+    @app.route('/admin/checkins/stats')
+    @login_required
+    @admin_required
+    @read_replica
+    def admin_checkin_stats():
+        days = request.args.get('days', 30, type=int)
+        return jsonify(dict(checkin_stats(days=max(1, min(days, 366))), ok=True))
+
+
     # ================================================================
     #                     RUTINAS (ADMIN)
     # ================================================================
@@ -237,28 +599,19 @@ def create_app():
                 flash('El título es obligatorio.', 'warning')
                 return redirect(url_for('admin_create_routine', user_id=user.id))
 
-            r = Routine(titulo=titulo, descripcion=descripcion, user_id=user.id, creado_por=current_user.nombre)
-            db.session.add(r)
-            db.session.flush()
+            exercises, errors = parse_exercises_payload(exercises_payload)
+            if errors:
+                flash('Ejercicios inválidos: ' + ' '.join(errors), 'danger')
+                return redirect(url_for('admin_create_routine', user_id=user.id))
 
-            if exercises_payload:
-                try:
-                    ex_list = json.loads(exercises_payload)
-                    for ex in ex_list:
-                        e = Exercise(
-                            nombre=ex.get('nombre'),
-                            series=int(ex.get('series')) if ex.get('series') else None,
-                            repeticiones=ex.get('repeticiones'),
-                            peso=ex.get('peso'),
-                            dia=ex.get('dia'),
-                            notas=ex.get('notas'),
-                            rutina_id=r.id
-                        )
-                        db.session.add(e)
-                except:
-                    pass
+            try:
+                create_routines(titulo, descripcion, [user.id], exercises, creado_por=current_user.nombre)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                flash('Error al crear la rutina.', 'danger')
+                return redirect(url_for('admin_user_detail', user_id=user.id))
 
-            db.session.commit()
             flash('Rutina creada con éxito.', 'success')
             return redirect(url_for('admin_user_detail', user_id=user.id))
 
@@ -266,12 +619,145 @@ def create_app():
         return render_template('admin_create_routine.html', user=user, form=form, days_remaining=days_remaining)
 
 
+    # -------- CREAR RUTINA EN LOTE (JSON) --------
+    @app.route('/admin/routines/batch', methods=['POST'])
+    @login_required
+    @admin_required
+    def admin_batch_create_routines():
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'ok': False, 'errors': ['Se esperaba un objeto JSON.']}), 400
+
+        errors = []
+        titulo = (data.get('titulo') or '').strip()
+        descripcion = data.get('descripcion')
+        if not titulo:
+            errors.append('El título es obligatorio.')
+        elif len(titulo) > 120:
+            errors.append('El título supera 120 caracteres.')
+
+        exercises, exercise_errors = parse_exercises_payload(data.get('exercises'))
+        errors.extend(exercise_errors)
+        user_ids = parse_member_ids(data, errors)
+
+        if errors:
+            return jsonify({'ok': False, 'errors': errors}), 400
+
+        try:
+            routines = create_routines(titulo, descripcion, user_ids, exercises, creado_por=current_user.nombre)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            return jsonify({'ok': False, 'errors': ['Error al guardar las rutinas.']}), 500
+
+        return jsonify({
+            'ok': True,
+            'routines': {str(r.user_id): r.id for r in routines},
+            'exercises_per_routine': len(exercises),
+        }), 201
+
+    # ================================================================
+    #                     PLANTILLAS DE RUTINA (ADMIN)
+    # ================================================================
+    @app.route('/admin/templates', methods=['GET'])
+    @login_required
+    @admin_required
+    def admin_templates():
+        templates = RoutineTemplate.query.order_by(RoutineTemplate.fecha_creacion.desc()).all()
+        return jsonify({
+            'ok': True,
+            'templates': [{
+                'id': t.id,
+                'titulo': t.titulo,
+                'descripcion': t.descripcion,
+                'creado_por': t.creado_por,
+            } for t in templates],
+        })
+
+    @app.route('/admin/templates', methods=['POST'])
+    @login_required
+    @admin_required
+    def admin_create_template():
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'ok': False, 'errors': ['Se esperaba un objeto JSON.']}), 400
+
+        errors = []
+        titulo = (data.get('titulo') or '').strip()
+        if not titulo:
+            errors.append('El título es obligatorio.')
+        elif len(titulo) > 120:
+            errors.append('El título supera 120 caracteres.')
+        exercises, exercise_errors = parse_exercises_payload(data.get('exercises'))
+        errors.extend(exercise_errors)
+
+        if errors:
+            return jsonify({'ok': False, 'errors': errors}), 400
+
+        try:
+            template = create_template(titulo, data.get('descripcion'), exercises, creado_por=current_user.nombre)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            return jsonify({'ok': False, 'errors': ['Error al guardar la plantilla.']}), 500
+
+        return jsonify({'ok': True, 'id': template.id, 'exercises': len(exercises)}), 201
+
+    @app.route('/admin/templates/<int:tid>/assign', methods=['POST'])
+    @login_required
+    @admin_required
+    def admin_assign_template(tid):
+        template = RoutineTemplate.query.get_or_404(tid)
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'ok': False, 'errors': ['Se esperaba un objeto JSON.']}), 400
+
+        errors = []
+        user_ids = parse_member_ids(data, errors)
+        if errors:
+            return jsonify({'ok': False, 'errors': errors}), 400
+
+        try:
+            routines = assign_template(template, user_ids, creado_por=current_user.nombre)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            return jsonify({'ok': False, 'errors': ['Error al asignar la plantilla.']}), 500
+
+        return jsonify({'ok': True, 'routines': {str(r.user_id): r.id for r in routines}}), 201
+
+    # -------- PERSONALIZAR EJERCICIO DE PLANTILLA --------
+    @app.route('/admin/routine/<int:rid>/template-exercise/<int:teid>', methods=['POST'])
+    @login_required
+    @admin_required
+    def admin_override_template_exercise(rid, teid):
+        r = Routine.query.get_or_404(rid)
+        te = TemplateExercise.query.get_or_404(teid)
+        if te.template_id != r.template_id:
+            abort(404)
+
+        # Solo los campos enviados: el resto lo toma override_template_exercise
+        # de la plantilla (al crear) o se conserva (si ya estaba personalizado)
+        fields, errors = parse_exercise(request.get_json(silent=True), partial=True)
+        if errors:
+            return jsonify({'ok': False, 'errors': errors}), 400
+
+        try:
+            e = override_template_exercise(r, te, fields)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            return jsonify({'ok': False, 'errors': ['Error al guardar el ejercicio.']}), 500
+
+        return jsonify({'ok': True, 'id': e.id})
+
+
     # -------- EDITAR RUTINA --------
     @app.route('/admin/routine/<int:rid>/edit', methods=['GET', 'POST'])
     @login_required
     @admin_required
     def admin_edit_routine(rid):
-        r = Routine.query.get_or_404(rid)
+        r = get_routine_or_404(rid)
         form = RoutineForm(obj=r)
 
         if form.validate_on_submit():
@@ -281,8 +767,7 @@ def create_app():
             flash('Rutina actualizada', 'success')
             return redirect(url_for('admin_user_detail', user_id=r.user_id))
 
-        exercises = Exercise.query.filter_by(rutina_id=r.id).all()
-        return render_template('admin_edit_routine.html', r=r, form=form, exercises=exercises)
+        return render_template('admin_edit_routine.html', r=r, form=form, exercises=r.resolved_exercises())
 
 
     # -------- ELIMINAR RUTINA --------
@@ -298,6 +783,81 @@ def create_app():
         return redirect(url_for('admin_user_detail', user_id=user_id))
 
 
+    # -------- AGREGAR EJERCICIO --------
+    @app.route('/admin/routine/<int:rid>/exercise', methods=['POST'])
+    @login_required
+    @admin_required
+    def admin_new_exercise(rid):
+        r = get_routine_or_404(rid)
+        fields, errors = parse_exercise(request.get_json(silent=True))
+        if errors:
+            return jsonify({'ok': False, 'errors': errors}), 400
+
+        if visible_exercise_count(r) >= MAX_EXERCISES_PER_ROUTINE:
+            return jsonify({'ok': False, 'errors': [f'Máximo {MAX_EXERCISES_PER_ROUTINE} ejercicios por rutina.']}), 400
+
+        try:
+            e = add_exercise(r, fields)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            return jsonify({'ok': False, 'errors': ['Error al guardar el ejercicio.']}), 500
+
+        return jsonify({'ok': True, 'id': e.id}), 201
+
+
+    # -------- EDITAR EJERCICIO --------
+    @app.route('/admin/exercise/<int:eid>/update', methods=['POST'])
+    @login_required
+    @admin_required
+    def admin_update_exercise(eid):
+        e = Exercise.query.get_or_404(eid)
+        r = get_routine_or_404(e.rutina_id)
+        data = request.get_json(silent=True)
+        return _apply_changes(r, {'update': [dict(data, id=eid)] if isinstance(data, dict) else [data]})
+
+
+    # -------- REORDENAR EJERCICIOS --------
+    @app.route('/admin/routine/<int:rid>/exercises/reorder', methods=['POST'])
+    @login_required
+    @admin_required
+    def admin_reorder_exercises(rid):
+        r = get_routine_or_404(rid)
+        data = request.get_json(silent=True)
+        return _apply_changes(r, {'order': data.get('order') if isinstance(data, dict) else data})
+
+
+    # -------- CAMBIOS EN LOTE --------
+    @app.route('/admin/routine/<int:rid>/exercises/batch', methods=['POST'])
+    @login_required
+    @admin_required
+    def admin_batch_exercises(rid):
+        """Crea, modifica, elimina y reordena ejercicios en una sola transacción."""
+        r = get_routine_or_404(rid)
+        return _apply_changes(r, request.get_json(silent=True))
+
+    def _apply_changes(r, payload):
+        changes, errors = parse_exercise_changes(payload)
+        if errors:
+            return jsonify({'ok': False, 'errors': errors}), 400
+
+        total = visible_exercise_count(r, changes['delete']) + len(changes['create'])
+        if total > MAX_EXERCISES_PER_ROUTINE:
+            return jsonify({'ok': False, 'errors': [f'Máximo {MAX_EXERCISES_PER_ROUTINE} ejercicios por rutina.']}), 400
+
+        try:
+            created = apply_exercise_changes(r, changes)
+            db.session.commit()
+        except ValueError as exc:
+            db.session.rollback()
+            return jsonify({'ok': False, 'errors': [str(exc)]}), 400
+        except Exception:
+            db.session.rollback()
+            return jsonify({'ok': False, 'errors': ['Error al guardar los ejercicios.']}), 500
+
+        return jsonify({'ok': True, 'created': [e.id for e in created], 'version': r.version})
+
+
     # -------- ELIMINAR EJERCICIO --------
     @app.route('/admin/exercise/<int:eid>/delete', methods=['POST'])
     @login_required
@@ -314,18 +874,38 @@ def create_app():
     # ================================================================
     @app.route('/mis_rutinas')
     @login_required
+    @read_replica
     def mis_rutinas():
-        routines = Routine.query.filter_by(user_id=current_user.id).order_by(Routine.fecha_creacion.desc()).all()
-        return render_template('mis_rutinas.html', routines=routines)
+        etag = page_etag('mis_rutinas', user_routines_fingerprint(current_user.id))
+        cached = not_modified(etag)
+        if cached:
+            return cached
+
+        routines = get_user_routines(current_user.id)
+        return conditional(app.make_response(render_template('mis_rutinas.html', routines=routines)), etag)
 
     @app.route('/routine/<int:rid>')
     @login_required
+    @read_replica
     def view_routine(rid):
         r = Routine.query.get_or_404(rid)
         if r.user_id != current_user.id and not current_user.is_admin():
             abort(403)
-        exercises = Exercise.query.filter_by(rutina_id=r.id).all()
-        return render_template('view_routine.html', r=r, exercises=exercises)
+
+        etag = page_etag('view_routine', r.id, r.version)
+        cached = not_modified(etag, r.updated_at)
+        if cached:
+            return cached
+
+        fragment_key = f'routine:{r.id}:v{r.version}'
+        body = fragment_cache.get(fragment_key)
+        if body is None:
+            # Solo se cargan los ejercicios si el fragmento no está en caché
+            body = render_template('_routine_body.html', r=r, exercises=r.resolved_exercises())
+            fragment_cache.set(fragment_key, body)
+
+        page = render_template('view_routine.html', r=r, body=Markup(body))
+        return conditional(app.make_response(page), etag, r.updated_at)
 
 
     return app
@@ -0,0 +1,159 @@
+# ==========================
+# assets.py
+# ==========================
+# Archivos estáticos con huella de contenido. Paso de despliegue:
+#
+#   flask --app app nova assets            # genera static/dist/ y el reporte
+#
+# Cada archivo de static/ se copia a static/dist/ con un hash en el nombre
+# (css/main.3f2a9c1b7d04.css); el CSS se minifica y CSS/JS se precomprimen
+# (.gz y, si está instalado el módulo brotli, .br). manifest.json traduce la ruta
+# original a la versionada, así que las plantillas siguen usando
+# url_for('static', filename='css/main.css') sin cambios. Sin manifest
+# (desarrollo) todo se sirve como antes.
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # dependencia opcional
+    brotli = None
+
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+REPORT_NAME = 'size-report.json'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt')
+MINIFIABLE = ('.css',)
+# Un año: los nombres versionados nunca cambian de contenido
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+# ---------------------- BUILD ----------------------
+def minify_css(text):
+    """Minificación conservadora: comentarios y espacios sobrantes."""
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def _hashed_name(path, content):
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    root, ext = os.path.splitext(path)
+    return f'{root}.{digest}{ext}'
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+
+def build_assets(static_folder):
+    """Regenera static/dist/. Devuelve el reporte de tamaños (lista de dicts)."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+
+    manifest, report = {}, []
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist)
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                original = f.read()
+
+            ext = os.path.splitext(name)[1].lower()
+            content = original
+            if ext in MINIFIABLE:
+                content = minify_css(original.decode('utf-8')).encode('utf-8')
+
+            hashed = _hashed_name(logical, content)
+            target = os.path.join(dist, hashed)
+            _write(target, content)
+            manifest[logical] = f'{DIST_DIR}/{hashed}'
+
+            entry = {'file': logical, 'original': len(original), 'built': len(content)}
+            if ext in COMPRESSIBLE:
+                gz = gzip.compress(content, compresslevel=9, mtime=0)
+                _write(target + '.gz', gz)
+                entry['gzip'] = len(gz)
+                if brotli is not None:
+                    br = brotli.compress(content, quality=11)
+                    _write(target + '.br', br)
+                    entry['br'] = len(br)
+            report.append(entry)
+
+    _write(os.path.join(dist, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    _write(os.path.join(dist, REPORT_NAME), json.dumps(report, indent=2).encode('utf-8'))
+    return report
+
+
+def format_report(report):
+    lines = [f'{"archivo":<28}{"original":>10}{"build":>10}{"gzip":>10}{"br":>10}']
+    for entry in report:
+        lines.append(f'{entry["file"]:<28}{entry["original"]:>10}{entry["built"]:>10}'
+                     f'{entry.get("gzip", "-"):>10}{entry.get("br", "-"):>10}')
+    total = sum(e.get('br', e.get('gzip', e['built'])) for e in report)
+    lines.append(f'Total transferido (mejor codificación): {total} bytes')
+    return '\n'.join(lines)
+
+
+# ---------------------- SERVIR ----------------------
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def init_assets(app):
+    """Reescribe las URLs de static con el manifest y sirve dist/ con caché larga."""
+    manifest = load_manifest(app.static_folder) if app.config.get('ASSET_MANIFEST', True) else {}
+    app.extensions['nova_assets'] = manifest
+
+    @app.url_defaults
+    def versioned_static(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    app.view_functions['static'] = serve_static
+
+
+def serve_static(filename):
+    if not filename.startswith(DIST_DIR + '/'):
+        # Range y las validaciones condicionales las resuelve send_file
+        return current_app.send_static_file(filename)
+
+    folder = current_app.static_folder
+    accepted = request.accept_encodings
+    encoding = None
+    if filename.endswith(COMPRESSIBLE) and 'Range' not in request.headers:
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[candidate] and os.path.isfile(os.path.join(folder, filename + suffix)):
+                encoding = candidate
+                break
+
+    if encoding:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(folder, filename + ('.br' if encoding == 'br' else '.gz'),
+                                       mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(folder, filename, max_age=IMMUTABLE_MAX_AGE)
+
+    if filename.endswith(COMPRESSIBLE):
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
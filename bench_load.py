@@ -0,0 +1,377 @@
+# ==========================
+# bench_load.py
+# ==========================
+# Prueba de carga local de los endpoints principales.
+#
+#   python bench_load.py seed --db /tmp/nova-bench.db                 # 50k usuarios, 200k rutinas, 2M ejercicios
+#   python bench_load.py seed --db /tmp/nova-bench.db --users 5000    # versión chica
+#   python bench_load.py run  --db /tmp/nova-bench.db --save bench_baseline.json
+#   python bench_load.py run  --db /tmp/nova-bench.db --baseline bench_baseline.json
+#
+# `run` levanta la app en un proceso aparte (servidor WSGI con hilos) y la
+# carga con N clientes HTTP concurrentes. Por escenario reporta p50/p95/p99,
+# peticiones por segundo y consultas SQL por petición (cabecera X-SQL-Queries).
+# Con --baseline compara contra un resultado guardado y termina con código 1
+# si algún escenario empeora más de --max-regression por ciento.
+
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, datetime, timedelta
+
+
+BENCH_PASSWORD = 'bench-password'
+ADMIN_EMAIL = 'admin@bench.local'
+SCENARIOS = ('login', 'dashboard', 'admin_dashboard', 'admin_user_detail', 'view_routine')
+SEED_CHUNK = 5000
+SAMPLE_USERS = 500
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SERVER = r'''
+import logging, signal, sys
+from werkzeug.serving import make_server
+# SIGTERM termina con sys.exit para que corran los atexit (pool de hash)
+signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+from app import create_app
+# Todos los clientes de la prueba son 127.0.0.1 y repiten correos: sin límite de intentos
+app = create_app({'WTF_CSRF_ENABLED': False, 'SQL_QUERY_COUNT_HEADER': True,
+                  'LOGIN_RATE_LIMIT_IP': 0, 'LOGIN_RATE_LIMIT_EMAIL': 0})
+server = make_server('127.0.0.1', int(sys.argv[1]), app, threaded=True)
+print('ready', flush=True)
+server.serve_forever()
+'''
+
+
+def _database_url(path):
+    return f'sqlite:///{os.path.abspath(path)}'
+
+
+def _app_for(db_path):
+    os.environ['DATABASE_URL'] = _database_url(db_path)
+    sys.path.insert(0, HERE)
+    from app import create_app
+    return create_app()
+
+
+# ---------------------- DATOS SINTÉTICOS ----------------------
+def seed(args):
+    """Crea la base con inserciones masivas (Core executemany por lotes)."""
+    if os.path.exists(args.db):
+        sys.exit(f'{args.db} ya existe; bórrala o usa otra ruta.')
+
+    app = _app_for(args.db)
+    from sqlalchemy import func, insert
+    from werkzeug.security import generate_password_hash
+    from analytics import rebuild_counters
+    from migrations import upgrade
+    from models import db, User, Routine, Exercise, asignar_client_ids, compute_subscription_end
+
+    rnd = random.Random(args.seed)
+    started = time.perf_counter()
+    with app.app_context():
+        upgrade(echo=lambda *a: None)
+        # Un solo hash para todos: hashear 50k contraseñas no es lo que se mide
+        password_hash = generate_password_hash(BENCH_PASSWORD)
+        admin = User(nombre='Bench Admin', email=ADMIN_EMAIL, role='admin', password_hash=password_hash)
+        db.session.add(admin)
+        db.session.commit()
+
+        today = date.today()
+        for start in range(0, args.users, SEED_CHUNK):
+            count = min(SEED_CHUNK, args.users - start)
+            rows = []
+            for i, client_id in zip(range(start, start + count), asignar_client_ids(count)):
+                sub_date = today - timedelta(days=rnd.randint(0, 120)) if rnd.random() < 0.8 else None
+                sub_days = rnd.choice((30, 60, 90)) if sub_date else None
+                rows.append({
+                    'client_id': client_id,
+                    'nombre': f'Cliente {i}',
+                    'email': f'user{i}@bench.local',
+                    'phone': f'3{rnd.randint(100000000, 999999999)}',
+                    'password_hash': password_hash,
+                    'role': 'user',
+                    'created_at': datetime.utcnow() - timedelta(minutes=args.users - i),
+                    'subscription_date': sub_date,
+                    'subscription_days': sub_days,
+                    'subscription_end': compute_subscription_end(sub_date, sub_days),
+                })
+            db.session.execute(insert(User), rows)
+            db.session.commit()
+        print(f'{args.users} usuarios ({time.perf_counter() - started:.1f}s)')
+
+        first_user = db.session.query(func.min(User.id)).filter(User.role == 'user').scalar()
+        routine_id = db.session.query(func.coalesce(func.max(Routine.id), 0)).scalar()
+        routines, exercises = [], []
+        for u in range(args.users):
+            for _ in range(args.routines_per_user):
+                routine_id += 1
+                routines.append({'id': routine_id, 'titulo': f'Rutina {routine_id}',
+                                 'descripcion': 'Rutina de prueba', 'user_id': first_user + u,
+                                 'creado_por': 'Bench Admin', 'fecha_creacion': datetime.utcnow(),
+                                 'updated_at': datetime.utcnow(), 'version': 1})
+                for orden in range(1, args.exercises_per_routine + 1):
+                    exercises.append({'rutina_id': routine_id, 'orden': orden,
+                                      'nombre': f'Ejercicio {orden}', 'series': rnd.randint(2, 5),
+                                      'repeticiones': str(rnd.choice((8, 10, 12, 15))),
+                                      'peso': f'{rnd.randint(5, 80)} kg', 'dia': f'Día {orden % 5 + 1}'})
+            if len(exercises) >= SEED_CHUNK * 4 or u == args.users - 1:
+                db.session.execute(insert(Routine), routines)
+                if exercises:
+                    db.session.execute(insert(Exercise), exercises)
+                db.session.commit()
+                routines, exercises = [], []
+        # Los inserts directos no actualizan los contadores del panel de analítica
+        rebuild_counters()
+        db.session.commit()
+        print(f'{args.users * args.routines_per_user} rutinas, '
+              f'{args.users * args.routines_per_user * args.exercises_per_routine} ejercicios '
+              f'({time.perf_counter() - started:.1f}s)')
+
+
+# ---------------------- CLIENTE HTTP ----------------------
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Client:
+    """Un cliente con sus propias cookies (una sesión por hilo)."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect())
+
+    def request(self, path, data=None):
+        """Devuelve (status, ms, consultas SQL)."""
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, data=body, timeout=60) as response:
+                response.read()
+                status, headers = response.status, response.headers
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            status, headers = exc.code, exc.headers
+        elapsed = (time.perf_counter() - started) * 1000
+        return status, elapsed, int(headers.get('X-SQL-Queries') or 0)
+
+    def login(self, email):
+        status, _, _ = self.request('/', {'form-type': 'login', 'email': email, 'password': BENCH_PASSWORD})
+        if status != 302:
+            raise RuntimeError(f'No se pudo iniciar sesión como {email} (HTTP {status}).')
+
+
+# ---------------------- CARGA ----------------------
+def _sample(db_path):
+    """Usuarios y rutinas al azar para repartir las peticiones."""
+    app = _app_for(db_path)
+    from sqlalchemy import func
+    from models import db, User, Routine
+
+    with app.app_context():
+        users = (db.session.query(User.id, User.email).filter(User.role == 'user')
+                 .order_by(func.random()).limit(SAMPLE_USERS).all())
+        routines = {}
+        for user_id, rid in (db.session.query(Routine.user_id, Routine.id)
+                             .filter(Routine.user_id.in_([u.id for u in users]))):
+            routines.setdefault(user_id, []).append(rid)
+    return [(u.id, u.email, routines[u.id]) for u in users if u.id in routines]
+
+
+def _plan(scenario, client, users, rnd):
+    """Prepara el cliente y devuelve la función que hace una petición."""
+    if scenario == 'login':
+        def one():
+            _, email, _ = rnd.choice(users)
+            client.cookies.clear()  # con sesión abierta "/" redirige sin validar
+            return client.request('/', {'form-type': 'login', 'email': email, 'password': BENCH_PASSWORD})
+        return one
+
+    if scenario in ('admin_dashboard', 'admin_user_detail'):
+        client.login(ADMIN_EMAIL)
+        if scenario == 'admin_dashboard':
+            return lambda: client.request('/admin')
+        return lambda: client.request(f'/admin/user/{rnd.choice(users)[0]}')
+
+    _, email, routine_ids = rnd.choice(users)
+    client.login(email)
+    if scenario == 'dashboard':
+        return lambda: client.request('/dashboard')
+    return lambda: client.request(f'/routine/{rnd.choice(routine_ids)}')
+
+
+def percentile(sorted_values, p):
+    """Percentil por rango más cercano."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[k]
+
+
+def run_scenario(scenario, base_url, users, args):
+    samples, errors = [], []
+    lock = threading.Lock()
+    per_thread = args.requests // args.concurrency
+
+    def worker(index):
+        rnd = random.Random(args.seed * 1000 + index)
+        one = _plan(scenario, Client(base_url), users, rnd)
+        for _ in range(args.warmup):
+            one()
+        local = []
+        for _ in range(per_thread):
+            status, ms, queries = one()
+            local.append((status, ms, queries))
+        with lock:
+            samples.extend(s for s in local if s[0] < 400)
+            errors.extend(s for s in local if s[0] >= 400)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies = sorted(s[1] for s in samples)
+    total = len(samples) + len(errors)
+    return {
+        'requests': total,
+        'errors': len(errors),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        'rps': round(total / wall, 1) if wall else 0.0,
+        'sql_per_request': round(sum(s[2] for s in samples) / len(samples), 2) if samples else 0.0,
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    if not os.path.exists(args.db):
+        sys.exit(f'{args.db} no existe; créala con: python bench_load.py seed --db {args.db}')
+
+    users = _sample(args.db)
+    if not users:
+        sys.exit('La base no tiene clientes con rutinas.')
+
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=_database_url(args.db))
+    server = subprocess.Popen([sys.executable, '-c', SERVER, str(port)], cwd=HERE, env=env,
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        if server.stdout.readline().strip() != 'ready':
+            sys.exit('El servidor no arrancó.')
+        base_url = f'http://127.0.0.1:{port}'
+        results = {}
+        for scenario in args.scenarios:
+            results[scenario] = run_scenario(scenario, base_url, users, args)
+            _print_row(scenario, results[scenario])
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        'commit': _git_commit(),
+        'date': datetime.utcnow().isoformat(timespec='seconds'),
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Resultado guardado en {args.save}')
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if not compare(baseline, report, args.max_regression):
+            sys.exit(1)
+
+
+def _print_row(scenario, r):
+    if not getattr(_print_row, 'header', False):
+        print(f'{"escenario":<20}{"req":>7}{"err":>5}{"p50":>9}{"p95":>9}{"p99":>9}{"req/s":>9}{"sql/req":>9}')
+        _print_row.header = True
+    print(f'{scenario:<20}{r["requests"]:>7}{r["errors"]:>5}{r["p50_ms"]:>9.1f}{r["p95_ms"]:>9.1f}'
+          f'{r["p99_ms"]:>9.1f}{r["rps"]:>9.1f}{r["sql_per_request"]:>9.2f}')
+
+
+def compare(baseline, report, max_regression):
+    """Imprime la variación contra la línea base; False si hay regresión."""
+    ok = True
+    print(f'\nComparación con {baseline.get("commit") or "línea base"} ({baseline.get("date")})')
+    for scenario, current in report['results'].items():
+        before = baseline['results'].get(scenario)
+        if not before:
+            continue
+        change = (current['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+        more_sql = current['sql_per_request'] > before['sql_per_request']
+        regression = change > max_regression or more_sql or current['errors'] > before['errors']
+        ok = ok and not regression
+        print(f'{scenario:<20} p95 {before["p95_ms"]:.1f} -> {current["p95_ms"]:.1f} ms ({change:+.0f}%), '
+              f'sql/req {before["sql_per_request"]} -> {current["sql_per_request"]}'
+              f'{"  REGRESIÓN" if regression else ""}')
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de NOVA.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_seed = sub.add_parser('seed', help='Crea una base con datos sintéticos.')
+    p_seed.add_argument('--db', required=True, help='Archivo SQLite a crear.')
+    p_seed.add_argument('--users', type=int, default=50000)
+    p_seed.add_argument('--routines-per-user', type=int, default=4)
+    p_seed.add_argument('--exercises-per-routine', type=int, default=10)
+    p_seed.add_argument('--seed', type=int, default=42)
+
+    p_run = sub.add_parser('run', help='Mide los endpoints contra una base sembrada.')
+    p_run.add_argument('--db', required=True)
+    p_run.add_argument('--concurrency', type=int, default=8)
+    p_run.add_argument('--requests', type=int, default=800, help='Peticiones por escenario.')
+    p_run.add_argument('--warmup', type=int, default=5, help='Peticiones de calentamiento por hilo.')
+    p_run.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    p_run.add_argument('--seed', type=int, default=42)
+    p_run.add_argument('--save', help='Guarda el resultado en este JSON.')
+    p_run.add_argument('--baseline', help='Compara contra un JSON guardado con --save.')
+    p_run.add_argument('--max-regression', type=float, default=20.0,
+                       help='Máximo aumento permitido del p95, en porcentaje.')
+
+    args = parser.parse_args()
+    if args.command == 'seed':
+        seed(args)
+    else:
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# ==========================
+# bench_startup.py
+# ==========================
+# Mide el arranque de un worker: tiempo de `import app`, de create_app() y
+# latencia de la primera petición (y de la segunda, ya en caliente).
+#
+#   python bench_startup.py [--runs 5] [--json]
+#
+# Cada corrida usa un proceso nuevo para medir el arranque en frío, contra
+# una base SQLite temporal inicializada con `nova init`.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+CHILD = r'''
+import json, time
+t0 = time.perf_counter()
+import app as nova_app
+t1 = time.perf_counter()
+app = nova_app.create_app({'TESTING': True})
+t2 = time.perf_counter()
+client = app.test_client()
+client.get('/')
+t3 = time.perf_counter()
+client.post('/', data={'form-type': 'login', 'email': 'bench@nova.local', 'password': 'bench-password'})
+t4 = time.perf_counter()
+client.get('/dashboard')
+t5 = time.perf_counter()
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'create_app_ms': (t2 - t1) * 1000,
+    'first_request_ms': (t3 - t2) * 1000,
+    'first_login_ms': (t4 - t3) * 1000,
+    'first_db_request_ms': (t5 - t4) * 1000,
+}))
+'''
+
+SETUP = r'''
+from app import create_app
+from migrations import upgrade
+from models import db, User
+app = create_app()
+with app.app_context():
+    upgrade(echo=lambda *a: None)
+    u = User(nombre='Bench', email='bench@nova.local')
+    u.password = 'bench-password'
+    db.session.add(u)
+    db.session.commit()
+'''
+
+
+def run(code, env):
+    out = subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                         capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return out.stdout.strip().splitlines()[-1] if out.stdout.strip() else ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='Imprime el resultado en JSON.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.join(tmp, "bench.db")}')
+        run(SETUP, env)
+        samples = [json.loads(run(CHILD, env)) for _ in range(args.runs)]
+
+    result = {key: {'median': statistics.median(s[key] for s in samples),
+                    'min': min(s[key] for s in samples),
+                    'max': max(s[key] for s in samples)}
+              for key in samples[0]}
+
+    if args.json:
+        print(json.dumps({'runs': args.runs, 'results': result}, indent=2))
+        return
+    print(f'{args.runs} corridas (ms)          mediana      min      max')
+    for key, stats in result.items():
+        print(f'{key:<24} {stats["median"]:>9.1f} {stats["min"]:>8.1f} {stats["max"]:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# ==========================
+# cache.py
+# ==========================
+# Cachés en memoria con backend intercambiable. El backend por defecto es
+# local al proceso: con varios workers cada uno tiene su copia y una
+# invalidación solo se ve en el worker que la hizo (el resto la ve al vencer
+# el TTL). Para compartirla basta con pasar otro objeto con get/set/delete/clear.
+
+import threading
+import time
+from collections import OrderedDict
+
+from werkzeug.utils import import_string
+
+
+# ---------------------- BACKENDS ----------------------
+class LocalCache:
+    """LRU con vencimiento (TTL), seguro entre hilos."""
+
+    def __init__(self, maxsize=1024, ttl=60, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires is not None and expires <= self._clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = self._clock() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class NullCache:
+    """No guarda nada (desactiva la caché)."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+def make_cache(backend='local', maxsize=1024, ttl=60):
+    """Crea la caché según la configuración.
+
+    `backend` puede ser 'local', 'null', una ruta importable a una clase
+    (p. ej. 'mi_modulo.RedisCache', que recibe maxsize y ttl) o un objeto
+    ya construido.
+    """
+    if not isinstance(backend, str):
+        return backend
+    if backend == 'local':
+        return LocalCache(maxsize=maxsize, ttl=ttl)
+    if backend in ('null', 'none', ''):
+        return NullCache()
+    return import_string(backend)(maxsize=maxsize, ttl=ttl)
@@ -0,0 +1,232 @@
+# ==========================
+# checkins.py
+# ==========================
+# Registro de asistencia (check-in en recepción).
+#
+# En hora pico llegan muchas visitas por segundo y en SQLite cada commit
+# toma el bloqueo de escritura de toda la base. Por eso las visitas se
+# encolan en memoria y un hilo las escribe por lotes (CHECKIN_BATCH_SIZE o
+# cada CHECKIN_FLUSH_MS): un solo commit por lote, que además
+# actualiza los resúmenes por hora y por cliente con upserts agregados.
+#
+# La cola vive en el proceso: lo pendiente se escribe al apagar el worker
+# (atexit), pero se perdería si el proceso muere de golpe. Con
+# CHECKIN_BUFFERED=0 cada visita se escribe en el momento.
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import case, func, insert, select
+
+from models import db, upsert, User, CheckIn, CheckInHourly, CheckInMember
+
+
+log = logging.getLogger('nova.checkins')
+
+WRITE_RETRIES = 3
+
+
+# ---------------------- ESCRITURA ----------------------
+def write_checkins(visits):
+    """Escribe [(user_id, fecha_hora), ...] y sus resúmenes en una transacción.
+
+    Se descartan las visitas de clientes que ya no existen (borrados
+    mientras sus visitas esperaban en la cola), así no quedan filas
+    huérfanas ni falla todo el lote por la clave foránea.
+    """
+    if not visits:
+        return
+
+    hourly_table = CheckInHourly.__table__
+    stmt_hourly = upsert(hourly_table, db.engine.dialect.name)
+    stmt_hourly = stmt_hourly.on_conflict_do_update(
+        index_elements=['day', 'hour'],
+        set_={'visits': hourly_table.c.visits + stmt_hourly.excluded.visits})
+
+    member_table = CheckInMember.__table__
+    stmt_member = upsert(member_table, db.engine.dialect.name)
+    stmt_member = stmt_member.on_conflict_do_update(
+        index_elements=['user_id'],
+        set_={
+            'visits': member_table.c.visits + stmt_member.excluded.visits,
+            'last_visit': case((member_table.c.last_visit > stmt_member.excluded.last_visit,
+                                member_table.c.last_visit), else_=stmt_member.excluded.last_visit),
+        })
+
+    user_table = User.__table__
+    with db.engine.begin() as conn:
+        user_ids = {user_id for user_id, _ in visits}
+        existing = set(conn.execute(select(user_table.c.id).where(user_table.c.id.in_(user_ids))).scalars())
+        if existing != user_ids:
+            log.warning('Se descartan visitas de clientes borrados: %s',
+                        ', '.join(str(uid) for uid in sorted(user_ids - existing)))
+            visits = [(user_id, when) for user_id, when in visits if user_id in existing]
+            if not visits:
+                return
+
+        hourly = Counter((when.date(), when.hour) for _, when in visits)
+        members = {}
+        for user_id, when in visits:
+            count, last = members.get(user_id, (0, when))
+            members[user_id] = (count + 1, max(last, when))
+
+        conn.execute(insert(CheckIn.__table__),
+                     [{'user_id': user_id, 'created_at': when} for user_id, when in visits])
+        conn.execute(stmt_hourly, [{'day': day, 'hour': hour, 'visits': n} for (day, hour), n in hourly.items()])
+        conn.execute(stmt_member, [{'user_id': user_id, 'visits': n, 'last_visit': last}
+                                   for user_id, (n, last) in members.items()])
+
+
+class CheckInWriter:
+    """Cola en memoria + hilo que escribe por lotes."""
+
+    def __init__(self, app, batch_size=200, flush_interval=1.0, max_queue=10000, buffered=True,
+                 put_timeout=0.5):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffered = buffered
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._atexit_registered = False
+
+    def submit(self, user_id, when=None):
+        when = when or datetime.now()
+        if not self.buffered:
+            write_checkins([(user_id, when)])
+            return
+        self._ensure_thread()
+        # Con la cola llena la petición espera un poco (contrapresión) y luego
+        # lanza queue.Full: quien llama escribe la visita en el momento
+        self._queue.put((user_id, when), timeout=self.put_timeout)
+
+    def _ensure_thread(self):
+        # El hilo nace con la primera visita, ya dentro del worker
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopping.clear()
+                    self._thread = threading.Thread(target=self._run, name='nova-checkins', daemon=True)
+                    self._thread.start()
+                    if not self._atexit_registered:
+                        atexit.register(self.stop)
+                        self._atexit_registered = True
+
+    def _take_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopping.is_set():
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch):
+        for attempt in range(1, WRITE_RETRIES + 1):
+            try:
+                with self.app.app_context():
+                    write_checkins(batch)
+                return
+            except Exception:
+                if attempt == WRITE_RETRIES:
+                    log.exception('No se pudieron guardar %d visitas.', len(batch))
+                else:
+                    time.sleep(0.2 * attempt)
+
+    def flush(self):
+        """Escribe ya todo lo pendiente (apagado del worker y pruebas)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+
+# ---------------------- VALIDACIÓN ----------------------
+def member_for_checkin(client_id, today=None):
+    """(usuario, error). Una consulta por el índice único de client_id."""
+    today = today or date.today()
+    user = User.query.filter_by(client_id=client_id).first()
+    if user is None or user.is_admin():
+        return None, 'Cliente no encontrado.'
+    if user.subscription_end is None or user.subscription_end <= today:
+        return user, 'La suscripción no está vigente.'
+    return user, None
+
+
+# ---------------------- CONSULTAS (RESÚMENES) ----------------------
+def visits_per_day(start, end):
+    rows = (db.session.query(CheckInHourly.day, func.sum(CheckInHourly.visits))
+            .filter(CheckInHourly.day >= start, CheckInHourly.day <= end)
+            .group_by(CheckInHourly.day)
+            .order_by(CheckInHourly.day))
+    return [(day, int(visits)) for day, visits in rows]
+
+
+def visits_per_hour(start, end):
+    rows = (db.session.query(CheckInHourly.hour, func.sum(CheckInHourly.visits))
+            .filter(CheckInHourly.day >= start, CheckInHourly.day <= end)
+            .group_by(CheckInHourly.hour)
+            .order_by(CheckInHourly.hour))
+    return [(hour, int(visits)) for hour, visits in rows]
+
+
+def top_members(limit=20):
+    return (db.session.query(User.id, User.client_id, User.nombre, CheckInMember.visits, CheckInMember.last_visit)
+            .join(CheckInMember, CheckInMember.user_id == User.id)
+            .order_by(CheckInMember.visits.desc(), User.id)
+            .limit(limit)
+            .all())
+
+
+def member_visits(user_id):
+    """(visitas totales, última visita) del cliente."""
+    row = db.session.get(CheckInMember, user_id)
+    return (row.visits, row.last_visit) if row else (0, None)
+
+
+def checkin_stats(days=30, today=None):
+    today = today or date.today()
+    start = today - timedelta(days=days - 1)
+    return {
+        'desde': start.isoformat(),
+        'hasta': today.isoformat(),
+        'por_dia': [{'dia': d.isoformat(), 'visitas': n} for d, n in visits_per_day(start, today)],
+        'por_hora': [{'hora': h, 'visitas': n} for h, n in visits_per_hour(start, today)],
+        'clientes': [{'id': r.id, 'client_id': r.client_id, 'nombre': r.nombre, 'visitas': r.visits,
+                      'ultima_visita': r.last_visit.isoformat(timespec='minutes') if r.last_visit else None}
+                     for r in top_members()],
+    }
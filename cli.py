@@ -0,0 +1,143 @@
+# ==========================
+# cli.py
+# ==========================
+# Comandos de administración:  flask --app app nova <comando>
+
+import json
+import os
+import sys
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from assets import build_assets, format_report
+from jobs import TASKS, enqueue, work
+from member_io import IMPORT_CHUNK_SIZE, detect_format, export_lines, import_members, read_rows
+from migrations import pending_migrations, upgrade
+from models import db, User
+from passwords import make_password_hash
+import tasks  # noqa: F401  (registra las tareas de la cola)
+
+
+nova_cli = AppGroup('nova', help='Comandos de administración de NOVA.')
+
+
+# ---------------------- ADMIN INICIAL ----------------------
+def ensure_admin():
+    admin_email = os.environ.get('ADMIN_EMAIL', 'andresnova@gmail.com')
+    admin_password = os.environ.get('ADMIN_PASSWORD', '123456')
+    admin_nombre = os.environ.get('ADMIN_NOMBRE', 'Administrador')
+
+    existing_admin = User.query.filter_by(email=admin_email).first()
+    if not existing_admin:
+        admin = User(nombre=admin_nombre, email=admin_email, role='admin')
+        admin.password_hash = make_password_hash(admin_password)
+        db.session.add(admin)
+        db.session.commit()
+        click.echo(f"Admin creado: {admin_email} / {admin_password}")
+
+
+# ---------------------- MIGRACIONES ----------------------
+@nova_cli.command('migrate')
+@click.option('--status', is_flag=True, help='Solo lista las migraciones pendientes.')
+def migrate_command(status):
+    """Aplica las migraciones de esquema pendientes."""
+    if status:
+        pending = pending_migrations()
+        for version, description, _ in pending:
+            click.echo(f'Pendiente {version}: {description}')
+        if not pending:
+            click.echo('El esquema está al día.')
+        return
+
+    applied = upgrade(echo=click.echo)
+    click.echo(f'{len(applied)} migraciones aplicadas.')
+
+
+# ---------------------- INICIALIZAR ----------------------
+@nova_cli.command('init')
+def init_command():
+    """Aplica las migraciones y crea el admin inicial (una vez por despliegue).
+
+    create_app() no toca la base de datos, así que los workers arrancan sin
+    consultas; este comando es el único paso de arranque que escribe.
+    """
+    applied = upgrade(echo=click.echo)
+    click.echo(f'{len(applied)} migraciones aplicadas.')
+    ensure_admin()
+
+
+# ---------------------- IMPORTAR CLIENTES ----------------------
+@nova_cli.command('import-members')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl', 'json']), default=None,
+              help='Formato del archivo (por defecto según la extensión).')
+@click.option('--chunk-size', default=IMPORT_CHUNK_SIZE, show_default=True,
+              help='Clientes por lote / transacción.')
+def import_members_command(path, fmt, chunk_size):
+    """Importa clientes desde un archivo CSV, JSON Lines o JSON."""
+    fmt = fmt or detect_format(path)
+    with open(path, newline='', encoding='utf-8-sig') as stream:
+        try:
+            result = import_members(read_rows(stream, fmt), chunk_size=chunk_size)
+        except ValueError as exc:
+            raise click.ClickException(str(exc))
+
+    click.echo(f'Creados: {result.created}')
+    click.echo(f'Correos repetidos: {len(result.duplicates)}')
+    for error in result.errors:
+        click.echo(error, err=True)
+
+
+# ---------------------- EXPORTAR ----------------------
+@nova_cli.command('export')
+@click.argument('kind', type=click.Choice(['users', 'routines', 'exercises']))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default='csv', show_default=True)
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None,
+              help='Archivo de salida (por defecto stdout).')
+def export_command(kind, fmt, output):
+    """Exporta usuarios, rutinas o ejercicios en streaming."""
+    stream = open(output, 'w', newline='', encoding='utf-8') if output else sys.stdout
+    try:
+        for chunk in export_lines(kind, fmt):
+            stream.write(chunk)
+    finally:
+        if output:
+            stream.close()
+
+
+# ---------------------- ARCHIVOS ESTÁTICOS ----------------------
+@nova_cli.command('assets')
+@click.option('--json', 'as_json', is_flag=True, help='Imprime el reporte de tamaños en JSON (para CI).')
+def assets_command(as_json):
+    """Genera static/dist/ (huellas, minificado y precompresión)."""
+    report = build_assets(current_app.static_folder)
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+    else:
+        click.echo(format_report(report))
+
+
+# ---------------------- COLA DE TRABAJOS ----------------------
+@nova_cli.command('worker')
+@click.option('--once', is_flag=True, help='Procesa lo pendiente y termina (para cron).')
+@click.option('--batch', default=20, show_default=True, help='Trabajos por pasada.')
+@click.option('--sleep', 'idle_sleep', default=2.0, show_default=True, help='Espera cuando no hay trabajos (s).')
+def worker_command(once, batch, idle_sleep):
+    """Ejecuta los trabajos en segundo plano (recordatorios, limpieza...)."""
+    work(current_app._get_current_object(), batch=batch, idle_sleep=idle_sleep, once=once)
+
+
+@nova_cli.command('enqueue')
+@click.argument('name', type=click.Choice(sorted(TASKS)))
+@click.option('--payload', default=None, help='Datos de la tarea en JSON.')
+def enqueue_command(name, payload):
+    """Encola una tarea para que la corra el worker."""
+    try:
+        data = json.loads(payload) if payload else None
+    except ValueError:
+        raise click.BadParameter('JSON inválido.', param_hint='--payload')
+    job = enqueue(name, data)
+    db.session.commit()
+    click.echo(f'Trabajo {job.id} encolado ({name}).')
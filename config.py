@@ -0,0 +1,118 @@
+# ==========================
+# config.py
+# ==========================
+# Configuración leída de variables de entorno (o de un archivo .env).
+
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'si', 'sí', 'on')
+
+
+def _is_memory_sqlite(uri):
+    return uri.startswith('sqlite') and (uri in ('sqlite://', 'sqlite:///') or ':memory:' in uri)
+
+
+# ---------------------- MOTOR DE BASE DE DATOS ----------------------
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS para la URI dada.
+
+    SQLite en memoria usa un pool de una conexión por hilo, que no admite
+    tamaño de pool ni overflow.
+    """
+    options = {'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True)}
+    if _is_memory_sqlite(uri):
+        return options
+
+    options.update({
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+    })
+    return options
+
+
+def sqlite_pragmas():
+    """PRAGMAs que se aplican a cada conexión SQLite nueva.
+
+    WAL deja leer mientras otro proceso escribe; synchronous=NORMAL es seguro
+    con WAL y evita un fsync por commit; busy_timeout espera el bloqueo en
+    vez de fallar con "database is locked".
+    """
+    return {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'mmap_size': _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+    }
+
+
+def load_config():
+    uri = os.environ.get('DATABASE_URL', 'sqlite:///gym.db')
+    config = {
+        'SECRET_KEY': os.environ.get('SECRET_KEY', 'nova-secret-key'),
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'SQLITE_PRAGMAS': sqlite_pragmas(),
+        # Caché de user_loader: 'local', 'null' o ruta a una clase propia
+        'USER_CACHE_BACKEND': os.environ.get('USER_CACHE_BACKEND', 'local'),
+        'USER_CACHE_TTL': _env_int('USER_CACHE_TTL', 60),
+        'USER_CACHE_SIZE': _env_int('USER_CACHE_SIZE', 4096),
+        # Caché del HTML de rutinas (clave: id + versión de la rutina)
+        'FRAGMENT_CACHE_BACKEND': os.environ.get('FRAGMENT_CACHE_BACKEND', 'local'),
+        'FRAGMENT_CACHE_TTL': _env_int('FRAGMENT_CACHE_TTL', 3600),
+        'FRAGMENT_CACHE_SIZE': _env_int('FRAGMENT_CACHE_SIZE', 2048),
+        # Hash de contraseñas (passwords.py). Cambiar el método es seguro:
+        # cada usuario se re-hashea al iniciar sesión.
+        'PASSWORD_HASH_METHOD': os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+        'PASSWORD_SALT_LENGTH': _env_int('PASSWORD_SALT_LENGTH', 16),
+        'PASSWORD_HASH_WORKERS': _env_int('PASSWORD_HASH_WORKERS', None),  # None = núcleos de la CPU
+        'PASSWORD_HASH_MAX_PENDING': _env_int('PASSWORD_HASH_MAX_PENDING', None),
+        'PASSWORD_HASH_TIMEOUT': _env_int('PASSWORD_HASH_TIMEOUT', 5),
+        # Intentos de login por correo y por IP en cada ventana (0 = sin límite).
+        # El de IP viene apagado: los clientes en el Wi-Fi del gimnasio (NAT) o
+        # detrás de un proxy sin PROXY_FIX_X_FOR comparten una sola dirección.
+        'LOGIN_RATE_LIMIT_EMAIL': _env_int('LOGIN_RATE_LIMIT_EMAIL', 10),
+        'LOGIN_RATE_LIMIT_IP': _env_int('LOGIN_RATE_LIMIT_IP', 0),
+        'LOGIN_RATE_WINDOW': _env_int('LOGIN_RATE_WINDOW', 300),
+        'RATE_LIMIT_BACKEND': os.environ.get('RATE_LIMIT_BACKEND', 'local'),
+        # Proxies de confianza delante de la app (nginx, balanceador): con N > 0
+        # remote_addr sale de X-Forwarded-For (ProxyFix). 0 = conexión directa.
+        'PROXY_FIX_X_FOR': _env_int('PROXY_FIX_X_FOR', 0),
+        # Check-ins (checkins.py): escritura por lotes
+        'CHECKIN_BUFFERED': _env_bool('CHECKIN_BUFFERED', True),
+        'CHECKIN_BATCH_SIZE': _env_int('CHECKIN_BATCH_SIZE', 200),
+        'CHECKIN_FLUSH_MS': _env_int('CHECKIN_FLUSH_MS', 1000),
+        # Cola de trabajos (jobs.py) y avisos a clientes (notifications.py)
+        'JOBS_IN_PROCESS': _env_bool('JOBS_IN_PROCESS', False),
+        'NOTIFY_TRANSPORT': os.environ.get('NOTIFY_TRANSPORT', 'log'),
+        'NOTIFY_COUNTRY_CODE': os.environ.get('NOTIFY_COUNTRY_CODE', '57'),
+        'NOTIFY_REMINDER_DAYS': _env_int('NOTIFY_REMINDER_DAYS', 3),
+        'WHATSAPP_TOKEN': os.environ.get('WHATSAPP_TOKEN'),
+        'WHATSAPP_PHONE_ID': os.environ.get('WHATSAPP_PHONE_ID'),
+        # Días tras el vencimiento antes de borrar al cliente (0 = nunca)
+        'MEMBER_RETENTION_DAYS': _env_int('MEMBER_RETENTION_DAYS', 0),
+        # Instrumentación (metrics.py)
+        'METRICS_ENABLED': _env_bool('METRICS_ENABLED', False),
+        'METRICS_TOKEN': os.environ.get('METRICS_TOKEN'),
+        'SLOW_QUERY_MS': _env_int('SLOW_QUERY_MS', 200),
+        'PROFILER_ENABLED': _env_bool('PROFILER_ENABLED', False),
+    }
+
+    # Réplica de solo lectura para las vistas de clientes. Con SQLite puede
+    # ser el mismo archivo (relativo a instance/) abierto en modo lectura:
+    #   DATABASE_READ_URL=sqlite:///file:gym.db?mode=ro&uri=true
+    read_uri = os.environ.get('DATABASE_READ_URL')
+    if read_uri:
+        config['SQLALCHEMY_BINDS'] = {'replica': dict(engine_options(read_uri), url=read_uri)}
+    return config
@@ -1,10 +1,11 @@
 from app import create_app
 from models import db, User
+from migrations import upgrade
 
 app = create_app()
 
 with app.app_context():
-    db.create_all()
+    upgrade()
 
     email = "andresherrera0893@gmail.com"
 
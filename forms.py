@@ -2,6 +2,8 @@
 # forms.py
 # ==========================
 
+import json
+
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, TextAreaField, IntegerField
 from wtforms.validators import DataRequired, Email, Length, Optional, Regexp
@@ -51,3 +53,138 @@ class RoutineWithExercisesForm(FlaskForm):
     titulo = StringField('Título', validators=[DataRequired(), Length(1,120)])
     descripcion = TextAreaField('Descripción general', validators=[Optional(), Length(0,2000)])
     submit = SubmitField('Guardar rutina y ejercicios')
+
+
+# ---------------------- EJERCICIOS (PAYLOAD JSON) ----------------------
+MAX_EXERCISES_PER_ROUTINE = 200
+EXERCISE_TEXT_FIELDS = {'nombre': 150, 'repeticiones': 50, 'peso': 50, 'dia': 30, 'notas': 500}
+
+
+def parse_exercise(ex, label='Ejercicio', partial=False):
+    """Valida un ejercicio con las mismas reglas que ExerciseForm.
+
+    Con `partial=True` solo se validan y devuelven los campos presentes (para
+    actualizaciones parciales). Devuelve (ejercicio, errores); el ejercicio
+    es None si hay errores.
+    """
+    if not isinstance(ex, dict):
+        return None, [f'{label}: formato inválido.']
+
+    errors = []
+    row = {}
+    for field, max_len in EXERCISE_TEXT_FIELDS.items():
+        if partial and field not in ex:
+            continue
+        value = ex.get(field)
+        value = str(value).strip() if value is not None else ''
+        if len(value) > max_len:
+            errors.append(f'{label}: "{field}" supera {max_len} caracteres.')
+        row[field] = value or None
+
+    if 'nombre' in row and not row['nombre']:
+        errors.append(f'{label}: el nombre es obligatorio.')
+
+    if not partial or 'series' in ex:
+        series = ex.get('series')
+        if series in (None, ''):
+            row['series'] = None
+        else:
+            try:
+                row['series'] = int(series)
+                if row['series'] < 0:
+                    raise ValueError
+            except (TypeError, ValueError):
+                errors.append(f'{label}: "series" debe ser un número entero positivo.')
+
+    return (None if errors else row), errors
+
+
+def _parse_id_list(values, label):
+    if not isinstance(values, list):
+        return [], [f'{label}: debe ser una lista de ids.']
+    try:
+        ids = [int(v) for v in values]
+    except (TypeError, ValueError):
+        return [], [f'{label}: los ids deben ser números.']
+    if len(set(ids)) != len(ids):
+        return [], [f'{label}: hay ids repetidos.']
+    return ids, []
+
+
+def parse_exercises_payload(payload):
+    """Valida la lista completa de ejercicios antes de escribir nada.
+
+    `payload` puede ser el JSON en texto (campo oculto del formulario) o la
+    lista ya decodificada. Devuelve (ejercicios, errores).
+    """
+    if payload in (None, ''):
+        return [], []
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            return [], ['La lista de ejercicios no es un JSON válido.']
+    if not isinstance(payload, list):
+        return [], ['La lista de ejercicios debe ser un arreglo.']
+    if len(payload) > MAX_EXERCISES_PER_ROUTINE:
+        return [], [f'Máximo {MAX_EXERCISES_PER_ROUTINE} ejercicios por rutina.']
+
+    exercises, errors = [], []
+    for i, ex in enumerate(payload, start=1):
+        row, row_errors = parse_exercise(ex, f'Ejercicio {i}')
+        errors.extend(row_errors)
+        if row:
+            exercises.append(row)
+    return exercises, errors
+
+
+def parse_exercise_changes(payload):
+    """Valida un lote de cambios sobre los ejercicios de una rutina.
+
+    Formato (todas las claves son opcionales):
+        {"create": [{...}], "update": [{"id": 1, "series": 4}],
+         "delete": [2, 3], "order": [5, 1, 4]}
+
+    Devuelve (cambios, errores) con las mismas claves ya validadas.
+    """
+    if not isinstance(payload, dict):
+        return None, ['Se esperaba un objeto JSON.']
+
+    errors = []
+    create, create_errors = parse_exercises_payload(payload.get('create'))
+    errors.extend(create_errors)
+
+    update = {}
+    updates = payload.get('update') or []
+    if not isinstance(updates, list):
+        errors.append('"update" debe ser una lista.')
+        updates = []
+    for i, ex in enumerate(updates, start=1):
+        label = f'Cambio {i}'
+        try:
+            eid = int(ex['id'])
+        except (TypeError, KeyError, ValueError):
+            errors.append(f'{label}: falta el id del ejercicio.')
+            continue
+        if eid in update:
+            errors.append(f'{label}: el ejercicio {eid} aparece dos veces.')
+            continue
+        fields, row_errors = parse_exercise({k: v for k, v in ex.items() if k != 'id'}, label, partial=True)
+        errors.extend(row_errors)
+        if fields:
+            update[eid] = fields
+
+    delete, delete_errors = _parse_id_list(payload.get('delete') or [], '"delete"')
+    errors.extend(delete_errors)
+
+    order = None
+    if payload.get('order') is not None:
+        order, order_errors = _parse_id_list(payload['order'], '"order"')
+        errors.extend(order_errors)
+
+    if set(update) & set(delete):
+        errors.append('Un ejercicio no puede modificarse y eliminarse en el mismo lote.')
+
+    if errors:
+        return None, errors
+    return {'create': create, 'update': update, 'delete': delete, 'order': order}, []
@@ -0,0 +1,14 @@
+# ==========================
+# gunicorn.conf.py
+# ==========================
+#   gunicorn -c gunicorn.conf.py "app:create_app()"
+#
+# Al terminar cada worker se cierra su pool de hash de contraseñas
+# (passwords.py): esos procesos no mueren solos con el worker.
+
+
+def worker_exit(server, worker):
+    extensions = getattr(getattr(worker, 'wsgi', None), 'extensions', {})
+    hasher = extensions.get('nova_hasher')
+    if hasher is not None:
+        hasher.shutdown()
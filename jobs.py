@@ -0,0 +1,199 @@
+# ==========================
+# jobs.py
+# ==========================
+# Cola de trabajos en la propia base de datos (tabla job).
+#
+#   flask --app app nova worker            # worker aparte (recomendado)
+#   flask --app app nova worker --once     # procesa lo pendiente y sale (cron)
+#
+# o JOBS_IN_PROCESS=1 para correr el worker en un hilo de cada proceso web.
+#
+# Un trabajo fallido se reintenta con espera exponencial hasta max_attempts;
+# uno que quedó "running" porque su worker murió vuelve a la cola pasado
+# JOB_LOCK_TIMEOUT. Las tareas periódicas (SCHEDULE) las agenda el worker.
+# Por eso las tareas deben ser idempotentes: un trabajo puede correr más de
+# una vez si el worker muere justo después de terminarlo.
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Job
+
+
+log = logging.getLogger('nova.jobs')
+
+TASKS = {}
+# (tarea, cada cuántos segundos)
+SCHEDULE = []
+
+RETRY_BASE_SECONDS = 30
+JOB_LOCK_TIMEOUT = timedelta(minutes=15)
+
+
+def task(name, max_attempts=3, every=None):
+    """Registra una función como tarea; `every` (segundos) la hace periódica."""
+    def register(fn):
+        TASKS[name] = (fn, max_attempts)
+        if every:
+            SCHEDULE.append((name, every))
+        return fn
+    return register
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=None):
+    """Agrega un trabajo en la sesión actual; el commit lo hace quien llama."""
+    if name not in TASKS:
+        raise ValueError(f'Tarea desconocida: {name}')
+    job = Job(name=name, payload=json.dumps(payload) if payload is not None else None,
+              status='pending', attempts=0, max_attempts=max_attempts or TASKS[name][1],
+              run_at=run_at or datetime.utcnow())
+    db.session.add(job)
+    return job
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+# ---------------------- RECLAMAR Y EJECUTAR ----------------------
+def claim_jobs(limit, worker, now=None):
+    """Marca como 'running' hasta `limit` trabajos vencidos y los devuelve.
+
+    Un solo UPDATE con la condición status='pending' repetida, así dos
+    workers nunca toman el mismo trabajo.
+    """
+    now = now or datetime.utcnow()
+    table = Job.__table__
+    due = (select(table.c.id)
+           .where(table.c.status == 'pending', table.c.run_at <= now)
+           .order_by(table.c.run_at, table.c.id)
+           .limit(limit)
+           .scalar_subquery())
+    with db.engine.begin() as conn:
+        conn.execute(update(table)
+                     .where(table.c.id.in_(due), table.c.status == 'pending')
+                     .values(status='running', locked_by=worker, locked_at=now,
+                             attempts=table.c.attempts + 1))
+    return (Job.query.filter_by(status='running', locked_by=worker, locked_at=now)
+            .order_by(Job.run_at, Job.id).all())
+
+
+def requeue_stale(now=None):
+    """Devuelve a la cola los trabajos cuyo worker dejó de responder."""
+    now = now or datetime.utcnow()
+    table = Job.__table__
+    with db.engine.begin() as conn:
+        return conn.execute(update(table)
+                            .where(table.c.status == 'running', table.c.locked_at < now - JOB_LOCK_TIMEOUT)
+                            .values(status='pending', locked_by=None, locked_at=None)).rowcount
+
+
+def run_job(job):
+    fn, _ = TASKS.get(job.name, (None, None))
+    try:
+        if fn is None:
+            raise LookupError(f'Tarea desconocida: {job.name}')
+        fn(json.loads(job.payload) if job.payload else None)
+        db.session.commit()  # lo que haya dejado la tarea (p. ej. trabajos encolados)
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+        job.last_error = None
+    except Exception:
+        db.session.rollback()
+        job.last_error = traceback.format_exc(limit=5)
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+            log.error('Trabajo %s (%s) falló definitivamente:\n%s', job.id, job.name, job.last_error)
+        else:
+            job.status = 'pending'
+            job.run_at = datetime.utcnow() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+            log.warning('Trabajo %s (%s) falló, reintento %d de %d', job.id, job.name,
+                        job.attempts, job.max_attempts)
+    job.locked_by = None
+    job.locked_at = None
+    db.session.commit()
+
+
+def _enqueue_once(name, now):
+    """Encola la tarea con unique_key=name en su propia transacción. El
+    índice único parcial hace que, si otro worker ganó la carrera, el
+    INSERT falle en vez de duplicar el trabajo."""
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(insert(Job.__table__).values(
+                name=name, unique_key=name, status='pending', attempts=0,
+                max_attempts=TASKS[name][1], run_at=now, created_at=now))
+        return True
+    except IntegrityError:
+        return False
+
+
+def schedule_periodic(now=None):
+    """Encola las tareas periódicas que toca correr (sin duplicar)."""
+    now = now or datetime.utcnow()
+    due = []
+    for name, every in SCHEDULE:
+        active = Job.query.filter(Job.name == name, Job.status.in_(('pending', 'running'))).first()
+        if active:
+            continue
+        last = (Job.query.filter(Job.name == name, Job.status.in_(('done', 'failed')))
+                .order_by(Job.finished_at.desc()).first())
+        if last is None or last.finished_at is None or last.finished_at <= now - timedelta(seconds=every):
+            due.append(name)
+    # Cierra la lectura antes de escribir con otra conexión (SQLite)
+    db.session.commit()
+    for name in due:
+        _enqueue_once(name, now)
+
+
+def run_pending(limit=20, worker=None):
+    """Una pasada del worker. Devuelve cuántos trabajos ejecutó."""
+    worker = worker or worker_id()
+    requeue_stale()
+    schedule_periodic()
+    jobs = claim_jobs(limit, worker)
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
+
+
+def work(app, batch=20, idle_sleep=2.0, once=False, stop_event=None):
+    """Bucle del worker: procesa lotes y duerme cuando no hay nada."""
+    worker = worker_id()
+    while not (stop_event and stop_event.is_set()):
+        with app.app_context():
+            try:
+                done = run_pending(batch, worker)
+            except Exception:
+                db.session.rollback()
+                log.exception('Error en el worker de trabajos')
+                done = 0
+        if once and done == 0:
+            return
+        if done == 0:
+            time.sleep(idle_sleep)
+
+
+_in_process = {'thread': None, 'lock': threading.Lock()}
+
+
+def start_in_process_worker(app):
+    """Arranca (una vez por proceso) el worker en un hilo daemon."""
+    if _in_process['thread'] is not None:
+        return
+    with _in_process['lock']:
+        if _in_process['thread'] is None:
+            thread = threading.Thread(target=work, args=(app,), kwargs={'idle_sleep': 5.0},
+                                      name='nova-jobs', daemon=True)
+            thread.start()
+            _in_process['thread'] = thread
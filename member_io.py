@@ -0,0 +1,254 @@
+# ==========================
+# member_io.py
+# ==========================
+# Importación y exportación masiva de clientes, rutinas y ejercicios.
+# Todo se procesa por lotes / generadores para usar memoria constante sin
+# importar el tamaño del archivo o de la base de datos.
+
+import csv
+import io
+import json
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from models import (db, User, Routine, Exercise, asignar_client_ids, bump_member_counters,
+                    compute_subscription_end)
+
+
+IMPORT_CHUNK_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+
+# Hash inválido a propósito: check_password_hash siempre devuelve False, el
+# cliente importado sin contraseña debe pedir una nueva al administrador.
+UNUSABLE_PASSWORD = '!'
+
+EXPORT_COLUMNS = {
+    'users': (User, ['id', 'client_id', 'nombre', 'email', 'phone', 'role', 'created_at',
+                     'subscription_date', 'subscription_days', 'subscription_end']),
+    'routines': (Routine, ['id', 'user_id', 'titulo', 'descripcion', 'fecha_creacion',
+                           'creado_por', 'template_id']),
+    'exercises': (Exercise, ['id', 'rutina_id', 'nombre', 'series', 'repeticiones', 'peso',
+                             'dia', 'notas', 'template_exercise_id', 'orden']),
+}
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.duplicates = []
+        self.errors = []
+
+    def as_dict(self):
+        return {'created': self.created, 'duplicates': self.duplicates, 'errors': self.errors}
+
+
+# ---------------------- LECTURA DE ARCHIVOS ----------------------
+def read_rows(stream, fmt):
+    """Itera las filas de un archivo de texto CSV, JSON Lines o JSON.
+
+    CSV y JSON Lines se leen fila por fila; un arreglo JSON se decodifica
+    completo, así que para archivos grandes conviene usar los otros formatos.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'jsonl':
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    elif fmt == 'json':
+        data = json.load(stream)
+        if not isinstance(data, list):
+            raise ValueError('El JSON debe ser un arreglo de clientes.')
+        yield from data
+    else:
+        raise ValueError(f'Formato no soportado: {fmt}')
+
+
+def detect_format(filename):
+    ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    return {'ndjson': 'jsonl'}.get(ext, ext)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ---------------------- IMPORTACIÓN ----------------------
+def _parse_member(row, line):
+    if not isinstance(row, dict):
+        return None, f'Fila {line}: formato inválido.'
+
+    def field(name):
+        value = row.get(name)
+        return str(value).strip() if value not in (None, '') else ''
+
+    nombre, email, phone = field('nombre'), field('email'), field('phone')
+    if not nombre or len(nombre) > 150:
+        return None, f'Fila {line}: nombre obligatorio (máx. 150 caracteres).'
+    if not email or '@' not in email or len(email) > 150:
+        return None, f'Fila {line}: correo inválido.'
+    if len(phone) > 20:
+        return None, f'Fila {line}: teléfono inválido.'
+
+    member = {
+        'nombre': nombre,
+        'email': email,
+        'phone': phone or None,
+        'password': field('password'),
+        'password_hash': field('password_hash'),
+        'subscription_date': None,
+        'subscription_days': None,
+    }
+    try:
+        if field('subscription_date'):
+            member['subscription_date'] = datetime.strptime(field('subscription_date'), '%Y-%m-%d').date()
+        if field('subscription_days'):
+            member['subscription_days'] = int(field('subscription_days'))
+    except ValueError:
+        return None, f'Fila {line}: suscripción inválida (fecha AAAA-MM-DD y días enteros).'
+    return member, None
+
+
+def _hash_passwords(members, hasher, executor):
+    """Calcula los hashes del lote con el hasher de la app, así la
+    importación respeta su límite de concurrencia (HasherBusy si está
+    saturado) en vez de ocupar todos los núcleos."""
+    pending = [m for m in members if m['password'] and not m['password_hash']]
+    for member, pwhash in zip(pending, executor.map(hasher.hash, [m['password'] for m in pending])):
+        member['password_hash'] = pwhash
+    for member in members:
+        if not member['password_hash']:
+            member['password_hash'] = UNUSABLE_PASSWORD
+
+
+def import_members(rows, chunk_size=IMPORT_CHUNK_SIZE, hasher=None):
+    """Inserta clientes por lotes; un commit por lote.
+
+    Los correos repetidos (en el archivo o ya registrados) se detectan con
+    operaciones de conjuntos: una sola consulta IN por lote. Si un correo
+    del lote se registra mientras tanto, ese lote se descarta y se informa
+    como error; volver a importar el archivo lo completa.
+    """
+    hasher = hasher or current_app.extensions['nova_hasher']
+    result = ImportResult()
+    seen = set()
+    line = 1
+
+    # Un hilo por proceso del pool: no se piden más hashes a la vez que
+    # los que el pool atiende, y quedan lugares para los logins
+    with ThreadPoolExecutor(max_workers=max(1, hasher.workers)) as executor:
+        for chunk in _chunks(rows, chunk_size):
+            first_line = line + 1
+            members = []
+            for row in chunk:
+                line += 1
+                member, error = _parse_member(row, line)
+                if error:
+                    result.errors.append(error)
+                else:
+                    members.append(member)
+
+            emails = {m['email'] for m in members}
+            existing = {email for (email,) in
+                        db.session.query(User.email).filter(User.email.in_(emails))} if emails else set()
+
+            new_members = []
+            for member in members:
+                if member['email'] in existing or member['email'] in seen:
+                    result.duplicates.append(member['email'])
+                    continue
+                seen.add(member['email'])
+                new_members.append(member)
+
+            if not new_members:
+                continue
+
+            _hash_passwords(new_members, hasher, executor)
+            try:
+                client_ids = asignar_client_ids(len(new_members))
+                users = [{
+                    'client_id': client_id,
+                    'nombre': m['nombre'],
+                    'email': m['email'],
+                    'phone': m['phone'],
+                    'password_hash': m['password_hash'],
+                    'role': 'user',
+                    'created_at': datetime.utcnow(),
+                    'subscription_date': m['subscription_date'],
+                    'subscription_days': m['subscription_days'],
+                    'subscription_end': compute_subscription_end(m['subscription_date'], m['subscription_days']),
+                } for m, client_id in zip(new_members, client_ids)]
+                db.session.execute(insert(User), users)
+                # El insert directo no pasa por los eventos del ORM
+                bump_member_counters(db.session.connection(),
+                                     signups=Counter(u['created_at'].date() for u in users),
+                                     ends=Counter(u['subscription_end'] for u in users))
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                result.errors.append(f'Filas {first_line} a {line}: un correo se registró durante la '
+                                     f'importación; el lote no se guardó, vuelve a importar el archivo.')
+                continue
+            result.created += len(new_members)
+
+    return result
+
+
+# ---------------------- EXPORTACIÓN ----------------------
+def _export_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def iter_export_rows(kind):
+    """Genera diccionarios de la tabla pedida leyendo por lotes (yield_per)."""
+    model, columns = EXPORT_COLUMNS[kind]
+    query = (db.session.query(*[getattr(model, c) for c in columns])
+             .order_by(model.id)
+             .execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for row in query:
+        yield {c: _export_value(v) for c, v in zip(columns, row)}
+
+
+def _jsonl_lines(kind):
+    for row in iter_export_rows(kind):
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def _csv_lines(kind):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS[kind][1])
+    writer.writeheader()
+    for row in iter_export_rows(kind):
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_lines(kind, fmt):
+    """Generador del archivo exportado línea por línea (CSV o JSON Lines).
+
+    Valida al llamarla, no al iterar: la vista responde 404 antes de
+    empezar a transmitir.
+    """
+    if kind not in EXPORT_COLUMNS:
+        raise ValueError(f'Tabla no exportable: {kind}')
+    if fmt not in ('csv', 'jsonl'):
+        raise ValueError(f'Formato no soportado: {fmt}')
+    return _jsonl_lines(kind) if fmt == 'jsonl' else _csv_lines(kind)
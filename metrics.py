@@ -0,0 +1,244 @@
+# ==========================
+# metrics.py
+# ==========================
+# Instrumentación opcional (METRICS_ENABLED=1):
+#
+#   - duración de cada petición por endpoint, método y código;
+#   - cantidad y duración de consultas SQL por endpoint (eventos de SQLAlchemy);
+#   - tiempo de render de cada plantilla;
+#   - log "nova.sql" de consultas que superan SLOW_QUERY_MS, con el SQL
+#     (sin parámetros, para no escribir datos de clientes en el log).
+#
+# Se exponen en formato Prometheus en /metrics (admins o cabecera
+# "Authorization: Bearer $METRICS_TOKEN"). Los contadores son por proceso:
+# con varios workers, Prometheus debe consultar cada uno.
+#
+# Con PROFILER_ENABLED=1 un admin puede agregar ?profile=1 a cualquier URL y
+# recibe el perfil de esa petición (pyinstrument si está instalado, si no
+# cProfile) en lugar de la página.
+
+import cProfile
+import hmac
+import io
+import logging
+import pstats
+import threading
+import time
+
+from flask import Response, abort, before_render_template, current_app, g, has_request_context, request, \
+    template_rendered
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import pyinstrument
+except ImportError:  # dependencia opcional
+    pyinstrument = None
+
+
+slow_query_log = logging.getLogger('nova.sql')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ---------------------- REGISTRO ----------------------
+class Registry:
+    """Contadores e histogramas en memoria, seguros entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # (nombre, etiquetas) -> valor
+        self._histograms = {}  # (nombre, etiquetas) -> [conteos por bucket, suma, total]
+        self._help = {}
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, value, buckets=DURATION_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist[0][i] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def render(self, buckets=DURATION_BUCKETS):
+        """Texto en formato de exposición de Prometheus."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._histograms.items())
+
+        lines, described = [], set()
+
+        def header(name):
+            if name not in described and name in self._help:
+                kind, text = self._help[name]
+                lines.append(f'# HELP {name} {text}')
+                lines.append(f'# TYPE {name} {kind}')
+                described.add(name)
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f'{name}{_labels(labels)} {value:g}')
+        for (name, labels), (counts, total, count) in histograms:
+            header(name)
+            for bound, bucket_count in zip(buckets, counts):
+                lines.append(f'{name}_bucket{_labels(labels + (("le", f"{bound:g}"),))} {bucket_count}')
+            lines.append(f'{name}_bucket{_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{_labels(labels)} {total:.6f}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+
+# ---------------------- SQL ----------------------
+_sql_listeners_installed = False
+
+
+def _install_sql_listeners():
+    """Una sola vez por proceso, para todos los engines."""
+    global _sql_listeners_installed
+    if _sql_listeners_installed:
+        return
+    _sql_listeners_installed = True
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('nova_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _end_query(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('nova_query_start')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        if not has_request_context() or 'nova_metrics' not in current_app.extensions:
+            return
+        g.nova_sql_count = g.get('nova_sql_count', 0) + 1
+        g.nova_sql_seconds = g.get('nova_sql_seconds', 0.0) + elapsed
+
+        slow_ms = current_app.config['SLOW_QUERY_MS']
+        if slow_ms and elapsed * 1000 >= slow_ms:
+            endpoint = request.endpoint or 'sin_ruta'
+            current_app.extensions['nova_metrics'].inc('nova_sql_slow_queries_total', {'endpoint': endpoint})
+            slow_query_log.warning('Consulta lenta (%.1f ms) en %s: %s', elapsed * 1000, endpoint,
+                                   ' '.join(statement.split()))
+
+
+# ---------------------- PERFILADOR ----------------------
+def _profile_requested():
+    return (current_app.config['PROFILER_ENABLED'] and request.args.get('profile')
+            and current_user.is_authenticated and current_user.is_admin())
+
+
+def _profile_response(profiler):
+    if pyinstrument is not None and isinstance(profiler, pyinstrument.Profiler):
+        profiler.stop()
+        return Response(profiler.output_html(), mimetype='text/html')
+
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(60)
+    return Response(out.getvalue(), mimetype='text/plain')
+
+
+# ---------------------- INTEGRACIÓN CON LA APP ----------------------
+def init_metrics(app):
+    if not app.config['METRICS_ENABLED'] and not app.config['PROFILER_ENABLED']:
+        return
+
+    if app.config['PROFILER_ENABLED']:
+        @app.before_request
+        def start_profiler():
+            if _profile_requested():
+                if pyinstrument is not None:
+                    g.nova_profiler = pyinstrument.Profiler()
+                    g.nova_profiler.start()
+                else:
+                    g.nova_profiler = cProfile.Profile()
+                    g.nova_profiler.enable()
+
+        @app.after_request
+        def stop_profiler(response):
+            profiler = g.pop('nova_profiler', None)
+            return _profile_response(profiler) if profiler is not None else response
+
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    registry = Registry()
+    registry.describe('nova_http_requests_total', 'counter', 'Peticiones HTTP atendidas.')
+    registry.describe('nova_http_request_duration_seconds', 'histogram', 'Duración de las peticiones.')
+    registry.describe('nova_sql_queries_total', 'counter', 'Consultas SQL ejecutadas.')
+    registry.describe('nova_sql_duration_seconds_total', 'counter', 'Tiempo total en consultas SQL.')
+    registry.describe('nova_sql_slow_queries_total', 'counter', 'Consultas que superaron SLOW_QUERY_MS.')
+    registry.describe('nova_template_render_seconds', 'histogram', 'Tiempo de render de plantillas.')
+    app.extensions['nova_metrics'] = registry
+    _install_sql_listeners()
+
+    @app.before_request
+    def start_request_timer():
+        g.nova_request_start = time.perf_counter()
+
+    def record(status):
+        started = g.pop('nova_request_start', None)
+        if started is None:
+            return
+        endpoint = request.endpoint or 'sin_ruta'
+        registry.inc('nova_http_requests_total',
+                     {'endpoint': endpoint, 'method': request.method, 'status': status})
+        registry.observe('nova_http_request_duration_seconds',
+                         {'endpoint': endpoint, 'method': request.method}, time.perf_counter() - started)
+        queries = g.pop('nova_sql_count', 0)
+        if queries:
+            registry.inc('nova_sql_queries_total', {'endpoint': endpoint}, queries)
+            registry.inc('nova_sql_duration_seconds_total', {'endpoint': endpoint}, g.pop('nova_sql_seconds', 0.0))
+
+    @app.after_request
+    def record_request(response):
+        record(response.status_code)
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exc):
+        # Si la petición terminó en una excepción, after_request no llegó a
+        # registrarla (o falló otro after_request): cuenta como 500
+        record(500)
+
+    def template_started(sender, template, context, **extra):
+        g.setdefault('nova_template_starts', []).append(time.perf_counter())
+
+    def template_finished(sender, template, context, **extra):
+        starts = g.get('nova_template_starts')
+        if starts:
+            registry.observe('nova_template_render_seconds', {'template': template.name or 'sin_nombre'},
+                             time.perf_counter() - starts.pop())
+
+    before_render_template.connect(template_started, app, weak=False)
+    template_rendered.connect(template_finished, app, weak=False)
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        given = request.headers.get('Authorization', '')
+        authorized = (token and hmac.compare_digest(given.encode(), f'Bearer {token}'.encode())) or \
+            (current_user.is_authenticated and current_user.is_admin())
+        if not authorized:
+            abort(403)
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,332 @@
+# ==========================
+# migrations.py
+# ==========================
+# Migraciones de esquema versionadas. Se ejecutan como paso de despliegue:
+#
+#   flask --app app nova migrate            # aplica las pendientes
+#   flask --app app nova migrate --status   # muestra cuáles faltan
+#
+# Cada migración es idempotente (revisa antes de crear o alterar), así que
+# volver a correr una que falló a medias es seguro. Las versiones aplicadas
+# se guardan en la tabla schema_migrations. El DDL está escrito para SQLite,
+# la base de datos con la que corre NOVA.
+
+from datetime import datetime
+
+from sqlalchemy import bindparam, inspect, select, text, update
+
+from analytics import rebuild_counters
+from models import db, User, compute_subscription_end, ensure_client_id_sequence, ensure_user_search_index
+
+
+BACKFILL_BATCH_SIZE = 1000
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+
+# ---------------------- HELPERS ----------------------
+def has_column(table, column):
+    return column in {c['name'] for c in inspect(db.engine).get_columns(table)}
+
+
+def execute(*statements):
+    with db.engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def add_column(table, column, definition):
+    if not has_column(table, column):
+        execute(f'ALTER TABLE "{table}" ADD COLUMN {column} {definition}')
+
+
+def backfill(table, assignments, where):
+    """UPDATE por lotes de BACKFILL_BATCH_SIZE filas, un commit por lote."""
+    while True:
+        with db.engine.begin() as conn:
+            result = conn.execute(text(
+                f'UPDATE "{table}" SET {assignments} WHERE id IN '
+                f'(SELECT id FROM "{table}" WHERE {where} LIMIT {BACKFILL_BATCH_SIZE})'))
+        if result.rowcount == 0:
+            break
+
+
+def create_index(name, table, columns, unique=False, where=None):
+    """Crea un índice si no existe (parcial si se pasa `where`).
+
+    En PostgreSQL usa CONCURRENTLY (fuera de transacción) para no bloquear
+    escrituras; en SQLite la creación es rápida y solo bloquea a escritores.
+    """
+    unique_sql = 'UNIQUE ' if unique else ''
+    cols = ', '.join(columns)
+    where_sql = f' WHERE {where}' if where else ''
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text(
+                f'CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON "{table}" ({cols}){where_sql}'))
+    else:
+        execute(f'CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON "{table}" ({cols}){where_sql}')
+
+
+def applied_versions():
+    execute("""CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(64) NOT NULL PRIMARY KEY,
+        applied_at DATETIME NOT NULL
+    )""")
+    with db.engine.connect() as conn:
+        return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def pending_migrations():
+    done = applied_versions()
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def upgrade(echo=print):
+    """Aplica en orden las migraciones pendientes. Devuelve las versiones aplicadas."""
+    applied = []
+    for version, description, fn in pending_migrations():
+        echo(f'Aplicando {version}: {description}')
+        fn()
+        with db.engine.begin() as conn:
+            conn.execute(text('INSERT INTO schema_migrations (version, applied_at) VALUES (:v, :t)'),
+                         {'v': version, 't': datetime.utcnow()})
+        applied.append(version)
+    return applied
+
+
+# ---------------------- MIGRACIONES ----------------------
+@migration('0001_baseline', 'Tablas user, routine y exercise')
+def _0001_baseline():
+    execute(
+        """CREATE TABLE IF NOT EXISTS "user" (
+            id INTEGER NOT NULL PRIMARY KEY,
+            client_id VARCHAR(16) NOT NULL,
+            nombre VARCHAR(150) NOT NULL,
+            email VARCHAR(150) NOT NULL,
+            phone VARCHAR(20),
+            password_hash VARCHAR(256) NOT NULL,
+            role VARCHAR(20),
+            created_at DATETIME
+        )""",
+        """CREATE TABLE IF NOT EXISTS routine (
+            id INTEGER NOT NULL PRIMARY KEY,
+            titulo VARCHAR(120) NOT NULL,
+            descripcion TEXT,
+            fecha_creacion DATETIME,
+            user_id INTEGER NOT NULL REFERENCES "user" (id),
+            creado_por VARCHAR(150)
+        )""",
+        """CREATE TABLE IF NOT EXISTS exercise (
+            id INTEGER NOT NULL PRIMARY KEY,
+            nombre VARCHAR(150) NOT NULL,
+            series INTEGER,
+            repeticiones VARCHAR(50),
+            peso VARCHAR(50),
+            dia VARCHAR(30),
+            notas TEXT,
+            rutina_id INTEGER NOT NULL REFERENCES routine (id)
+        )""",
+    )
+    create_index('ix_user_client_id', 'user', ['client_id'], unique=True)
+    create_index('ix_user_email', 'user', ['email'], unique=True)
+
+
+@migration('0002_subscription', 'Columnas subscription_date y subscription_days')
+def _0002_subscription():
+    add_column('user', 'subscription_date', 'DATE')
+    add_column('user', 'subscription_days', 'INTEGER')
+
+
+@migration('0003_subscription_end', 'Vencimiento precalculado e indexado')
+def _0003_subscription_end():
+    add_column('user', 'subscription_end', 'DATE')
+
+    # Relleno por lotes: cada lote es una transacción corta
+    last_id = 0
+    while True:
+        with db.engine.begin() as conn:
+            rows = conn.execute(
+                select(User.id, User.subscription_date, User.subscription_days)
+                .where(User.id > last_id, User.subscription_end.is_(None),
+                       User.subscription_date.is_not(None), User.subscription_days.is_not(None))
+                .order_by(User.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            user_table = User.__table__
+            conn.execute(
+                update(user_table)
+                .where(user_table.c.id == bindparam('b_id'))
+                .values(subscription_end=bindparam('b_end')),
+                [{'b_id': row.id, 'b_end': compute_subscription_end(row.subscription_date, row.subscription_days)}
+                 for row in rows],
+            )
+            last_id = rows[-1].id
+
+    create_index('ix_user_subscription_end', 'user', ['subscription_end'])
+
+
+@migration('0004_indexes', 'Índices de búsqueda y de claves foráneas')
+def _0004_indexes():
+    create_index('ix_user_created_at_id', 'user', ['created_at', 'id'])
+    create_index('ix_user_nombre', 'user', ['nombre'])
+    create_index('ix_user_phone', 'user', ['phone'])
+    create_index('ix_routine_user_id', 'routine', ['user_id'])
+    create_index('ix_exercise_rutina_id', 'exercise', ['rutina_id'])
+
+
+@migration('0005_user_fts', 'Índice FTS5 de usuarios (solo SQLite)')
+def _0005_user_fts():
+    if db.engine.dialect.name == 'sqlite':
+        ensure_user_search_index()
+
+
+@migration('0006_templates', 'Plantillas de rutina')
+def _0006_templates():
+    execute(
+        """CREATE TABLE IF NOT EXISTS routine_template (
+            id INTEGER NOT NULL PRIMARY KEY,
+            titulo VARCHAR(120) NOT NULL,
+            descripcion TEXT,
+            fecha_creacion DATETIME,
+            creado_por VARCHAR(150)
+        )""",
+        """CREATE TABLE IF NOT EXISTS template_exercise (
+            id INTEGER NOT NULL PRIMARY KEY,
+            nombre VARCHAR(150) NOT NULL,
+            series INTEGER,
+            repeticiones VARCHAR(50),
+            peso VARCHAR(50),
+            dia VARCHAR(30),
+            notas TEXT,
+            template_id INTEGER NOT NULL REFERENCES routine_template (id)
+        )""",
+    )
+    add_column('routine', 'template_id', 'INTEGER REFERENCES routine_template (id)')
+    add_column('exercise', 'template_exercise_id', 'INTEGER REFERENCES template_exercise (id)')
+    create_index('ix_template_exercise_template_id', 'template_exercise', ['template_id'])
+    create_index('ix_routine_template_id', 'routine', ['template_id'])
+    create_index('ix_exercise_template_exercise_id', 'exercise', ['template_exercise_id'])
+
+
+@migration('0007_client_id_sequence', 'Contador de client_id')
+def _0007_client_id_sequence():
+    execute(
+        """CREATE TABLE IF NOT EXISTS id_sequence (
+            name VARCHAR(50) NOT NULL PRIMARY KEY,
+            next_value INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS client_id_reserved (
+            position INTEGER NOT NULL PRIMARY KEY
+        )""",
+    )
+    ensure_client_id_sequence()
+
+
+@migration('0008_routine_version', 'Versión y fecha de modificación de rutinas')
+def _0008_routine_version():
+    add_column('routine', 'version', 'INTEGER NOT NULL DEFAULT 1')
+    add_column('routine', 'updated_at', 'DATETIME')
+    backfill('routine', 'updated_at = fecha_creacion', 'updated_at IS NULL AND fecha_creacion IS NOT NULL')
+
+
+@migration('0009_routine_updated_index', 'Índice de rutinas por usuario y fecha de modificación')
+def _0009_routine_updated_index():
+    create_index('ix_routine_user_id_updated_at', 'routine', ['user_id', 'updated_at'])
+
+
+@migration('0010_exercise_orden', 'Orden explícito de los ejercicios de una rutina')
+def _0010_exercise_orden():
+    add_column('exercise', 'orden', 'INTEGER NOT NULL DEFAULT 0')
+    # Conserva el orden anterior (por id); orden no tiene que ser consecutivo
+    backfill('exercise', 'orden = id', 'orden = 0')
+    create_index('ix_exercise_rutina_id_orden', 'exercise', ['rutina_id', 'orden'])
+
+
+@migration('0011_check_in', 'Registro de asistencia y sus resúmenes')
+def _0011_check_in():
+    execute(
+        """CREATE TABLE IF NOT EXISTS check_in (
+            id INTEGER NOT NULL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES "user" (id),
+            created_at DATETIME NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS check_in_hourly (
+            day DATE NOT NULL,
+            hour INTEGER NOT NULL,
+            visits INTEGER NOT NULL,
+            PRIMARY KEY (day, hour)
+        )""",
+        """CREATE TABLE IF NOT EXISTS check_in_member (
+            user_id INTEGER NOT NULL PRIMARY KEY REFERENCES "user" (id),
+            visits INTEGER NOT NULL,
+            last_visit DATETIME
+        )""",
+    )
+    create_index('ix_check_in_user_id_created_at', 'check_in', ['user_id', 'created_at'])
+    create_index('ix_check_in_created_at', 'check_in', ['created_at'])
+
+
+@migration('0012_job', 'Cola de trabajos en segundo plano')
+def _0012_job():
+    execute(
+        """CREATE TABLE IF NOT EXISTS job (
+            id INTEGER NOT NULL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            payload TEXT,
+            status VARCHAR(20) NOT NULL,
+            attempts INTEGER NOT NULL,
+            max_attempts INTEGER NOT NULL,
+            run_at DATETIME NOT NULL,
+            locked_by VARCHAR(100),
+            locked_at DATETIME,
+            last_error TEXT,
+            created_at DATETIME,
+            finished_at DATETIME
+        )""",
+    )
+    create_index('ix_job_status_run_at', 'job', ['status', 'run_at'])
+    create_index('ix_job_name', 'job', ['name'])
+
+
+@migration('0013_analytics_counters', 'Contadores del panel de analítica')
+def _0013_analytics_counters():
+    execute(
+        """CREATE TABLE IF NOT EXISTS stat_signup_daily (
+            day DATE NOT NULL PRIMARY KEY,
+            members INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS stat_subscription_end (
+            day DATE NOT NULL PRIMARY KEY,
+            members INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS stat_coach (
+            coach VARCHAR(150) NOT NULL PRIMARY KEY,
+            routines INTEGER NOT NULL,
+            exercises INTEGER NOT NULL
+        )""",
+    )
+    # Carga inicial: la única vez que se agregan las tablas completas
+    rebuild_counters()
+    db.session.commit()
+
+
+@migration('0014_job_unique_key', 'Tareas periódicas sin duplicados entre workers')
+def _0014_job_unique_key():
+    add_column('job', 'unique_key', 'VARCHAR(100)')
+    create_index('ux_job_unique_key_active', 'job', ['unique_key'], unique=True,
+                 where="status IN ('pending', 'running')")
+
+
+@migration('0015_user_reminder_sent_for', 'Vencimiento ya avisado a cada cliente')
+def _0015_user_reminder_sent_for():
+    add_column('user', 'reminder_sent_for', 'DATE')
@@ -2,20 +2,156 @@
 # models.py
 # ==========================
 
+from contextlib import contextmanager
 from datetime import datetime, date, timedelta
-import random
-import string
+import hashlib
+import re
+import threading
 
+from flask import current_app, g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_sqlalchemy.session import Session
+from sqlalchemy import or_, and_, case, event, func, insert, inspect, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import selectinload
+from werkzeug.security import check_password_hash
 from flask_login import UserMixin
 
-db = SQLAlchemy()
+from passwords import make_password_hash
+
+# ---------------------- SESIÓN CON RÉPLICA DE LECTURA ----------------------
+class RoutingSession(Session):
+    """Envía las lecturas a la réplica cuando la vista lo pidió (g.use_read_replica).
+
+    Las escrituras (flush) siempre van a la base principal.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and has_app_context()
+                and g.get('use_read_replica') and 'replica' in self._db.engines):
+            return self._db.engines['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def install_sqlite_pragmas(engine, pragmas):
+    """Aplica los PRAGMA de config.sqlite_pragmas() a cada conexión nueva."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                try:
+                    cursor.execute(f'PRAGMA {name}={value}')
+                except Exception:
+                    # p. ej. journal_mode en una réplica abierta en modo lectura
+                    pass
+        finally:
+            cursor.close()
 
 
 # ---------------------- GENERADOR DE ID ----------------------
-def generar_id_numerico(longitud=8):
-    return ''.join(random.choices(string.digits, k=longitud))
+# El client_id sale de un contador (tabla id_sequence) pasado por una
+# permutación de Feistel sobre los 10^8 números de 8 dígitos: los IDs se ven
+# aleatorios pero nunca se repiten, así que no hace falta consultar la tabla
+# user para buscar uno libre.
+CLIENT_ID_DIGITS = 8
+CLIENT_ID_SPACE = 10 ** CLIENT_ID_DIGITS
+_FEISTEL_HALF = 10 ** (CLIENT_ID_DIGITS // 2)
+_FEISTEL_KEYS = (0x5A17, 0x2C3D, 0x7E91, 0x1B4F)
+
+
+def _feistel_round(value, key):
+    digest = hashlib.blake2b(f'{key}:{value}'.encode(), digest_size=4).digest()
+    return int.from_bytes(digest, 'big') % _FEISTEL_HALF
+
+
+def permutar_numero(n):
+    left, right = divmod(n, _FEISTEL_HALF)
+    for key in _FEISTEL_KEYS:
+        left, right = right, (left + _feistel_round(right, key)) % _FEISTEL_HALF
+    return left * _FEISTEL_HALF + right
+
+
+def despermutar_numero(x):
+    left, right = divmod(x, _FEISTEL_HALF)
+    for key in reversed(_FEISTEL_KEYS):
+        left, right = (right - _feistel_round(left, key)) % _FEISTEL_HALF, left
+    return left * _FEISTEL_HALF + right
+
+
+class IdSequence(db.Model):
+    __tablename__ = 'id_sequence'
+
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ReservedClientId(db.Model):
+    """Posiciones del contador cuyo ID ya lo tenía un cliente antiguo
+    (IDs aleatorios anteriores al contador); el generador las salta."""
+    __tablename__ = 'client_id_reserved'
+
+    position = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+
+_reserved_cache = {}
+
+
+def _reserved_positions():
+    key = str(db.engine.url)
+    if key not in _reserved_cache:
+        rows = db.session.query(ReservedClientId.position).all()
+        _reserved_cache[key] = frozenset(row.position for row in rows)
+    return _reserved_cache[key]
+
+
+def ensure_client_id_sequence():
+    """Crea el contador de client_id (una sola vez por base de datos)."""
+    if db.session.get(IdSequence, 'client_id') is not None:
+        return
+
+    legacy = [cid for (cid,) in db.session.query(User.client_id)
+              if cid and cid.isdigit() and len(cid) == CLIENT_ID_DIGITS]
+    positions = {despermutar_numero(int(cid)) for cid in legacy}
+
+    db.session.add(IdSequence(name='client_id', next_value=0))
+    if positions:
+        db.session.execute(insert(ReservedClientId), [{'position': p} for p in positions])
+    db.session.commit()
+    _reserved_cache.pop(str(db.engine.url), None)
+
+
+def asignar_client_ids(cantidad=1):
+    """Reserva `cantidad` client_id nuevos con un único UPDATE ... RETURNING
+    al contador (SQLite >= 3.35 y PostgreSQL).
+
+    El UPDATE corre dentro de la transacción de quien llama, así dos
+    registros simultáneos nunca obtienen la misma posición.
+    """
+    reserved = _reserved_positions()
+    ids = []
+    while len(ids) < cantidad:
+        needed = cantidad - len(ids)
+        end = db.session.execute(
+            text("UPDATE id_sequence SET next_value = next_value + :n "
+                 "WHERE name = 'client_id' RETURNING next_value"),
+            {'n': needed},
+        ).scalar_one_or_none()
+        if end is None:
+            raise RuntimeError('Secuencia de client_id no inicializada (ensure_client_id_sequence).')
+        if end > CLIENT_ID_SPACE:
+            raise RuntimeError('Se agotaron los client_id de 8 dígitos.')
+
+        for position in range(end - needed, end):
+            if position not in reserved:
+                ids.append(f'{permutar_numero(position):0{CLIENT_ID_DIGITS}d}')
+    return ids
 
 
 # ---------------------- MODELO USER ----------------------
@@ -34,17 +170,22 @@ class User(UserMixin, db.Model):
 
     subscription_date = db.Column(db.Date, nullable=True)
     subscription_days = db.Column(db.Integer, nullable=True)
+    # Fecha de vencimiento precalculada (subscription_date + subscription_days).
+    # active_history: al cambiarla se carga el valor anterior, que necesitan
+    # los contadores de analítica para mover al cliente de fecha.
+    subscription_end = db.mapped_column(db.Date, nullable=True, index=True, active_history=True)
+    # Vencimiento del que ya se le avisó (tasks.subscription_reminders)
+    reminder_sent_for = db.Column(db.Date, nullable=True)
 
     routines = db.relationship('Routine', backref='user', lazy=True, cascade='all,delete-orphan')
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-
-        if not getattr(self, 'client_id', None):
-            nuevo_id = generar_id_numerico(8)
-            while User.query.filter_by(client_id=nuevo_id).first():
-                nuevo_id = generar_id_numerico(8)
-            self.client_id = nuevo_id
+    __table_args__ = (
+        # Paginación por cursor sobre (created_at, id) en el panel admin
+        db.Index('ix_user_created_at_id', 'created_at', 'id'),
+        # Búsqueda por prefijo cuando no hay FTS5 disponible
+        db.Index('ix_user_nombre', 'nombre'),
+        db.Index('ix_user_phone', 'phone'),
+    )
 
     @property
     def password(self):
@@ -52,7 +193,7 @@ class User(UserMixin, db.Model):
 
     @password.setter
     def password(self, password_plaintext):
-        self.password_hash = generate_password_hash(password_plaintext)
+        self.password_hash = make_password_hash(password_plaintext)
 
     def check_password(self, password_plaintext):
         return check_password_hash(self.password_hash, password_plaintext)
@@ -60,30 +201,90 @@ class User(UserMixin, db.Model):
     def is_admin(self):
         return self.role == 'admin'
 
+    # Campos que usan las vistas y plantillas a través de current_user
+    CACHED_FIELDS = ('id', 'client_id', 'nombre', 'email', 'phone', 'role', 'created_at',
+                     'subscription_date', 'subscription_days', 'subscription_end')
+
+    def to_cache(self):
+        return {field: getattr(self, field) for field in self.CACHED_FIELDS}
+
+    @classmethod
+    def from_cache(cls, data):
+        """Usuario (sin sesión) reconstruido desde la caché de user_loader."""
+        return cls(**data)
+
     def days_remaining(self):
-        if not self.subscription_date or not self.subscription_days:
-            return None
-        try:
-            start = self.subscription_date
-            if isinstance(start, datetime):
-                start = start.date()
-            end_date = start + timedelta(days=self.subscription_days)
-            remaining = (end_date - date.today()).days
-            return remaining if remaining > 0 else 0
-        except:
+        end_date = self.subscription_end or compute_subscription_end(
+            self.subscription_date, self.subscription_days)
+        if end_date is None:
             return None
+        remaining = (end_date - date.today()).days
+        return remaining if remaining > 0 else 0
+
+
+# ---------------------- VENCIMIENTO DE SUSCRIPCIÓN ----------------------
+def compute_subscription_end(start, days):
+    if not start or not days:
+        return None
+    try:
+        if isinstance(start, datetime):
+            start = start.date()
+        return start + timedelta(days=int(days))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+@event.listens_for(User, 'before_insert')
+@event.listens_for(User, 'before_update')
+def _sync_subscription_end(mapper, connection, target):
+    target.subscription_end = compute_subscription_end(
+        target.subscription_date, target.subscription_days)
+
+
+# ---------------------- CLIENT_ID DE USUARIOS NUEVOS ----------------------
+# Se asigna al guardar y no al construir el User, así crear uno no escribe
+# en la base; los de un mismo flush comparten un solo UPDATE al contador.
+@event.listens_for(RoutingSession, 'before_flush')
+def _assign_client_ids(session, flush_context, instances):
+    pending = [obj for obj in session.new if isinstance(obj, User) and not obj.client_id]
+    if pending:
+        for user, client_id in zip(pending, asignar_client_ids(len(pending))):
+            user.client_id = client_id
 
 
 # ---------------------- MODELO ROUTINE ----------------------
 class Routine(db.Model):
+    __table_args__ = (
+        # Consulta de cambios de la API: rutinas de un usuario desde una fecha
+        db.Index('ix_routine_user_id_updated_at', 'user_id', 'updated_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     titulo = db.Column(db.String(120), nullable=False)
     descripcion = db.Column(db.Text, nullable=True)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     creado_por = db.Column(db.String(150), nullable=True)
+    # Rutina asignada desde una plantilla: los ejercicios se leen de la
+    # plantilla y solo se guardan aquí los que el entrenador personaliza.
+    template_id = db.Column(db.Integer, db.ForeignKey('routine_template.id'), nullable=True, index=True)
+    # Se incrementa con cada cambio de la rutina o de sus ejercicios; sirve
+    # de clave para la caché de fragmentos y para los ETag.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    exercises = db.relationship('Exercise', backref='routine', lazy=True, cascade='all,delete-orphan',
+                                order_by='(Exercise.orden, Exercise.id)')
+    template = db.relationship('RoutineTemplate', lazy=True)
 
-    exercises = db.relationship('Exercise', backref='routine', lazy=True, cascade='all,delete-orphan')
+    def resolved_exercises(self):
+        """Ejercicios de la plantilla con los ajustes propios del usuario."""
+        if not self.template_id:
+            return list(self.exercises)
+        overrides = {e.template_exercise_id: e for e in self.exercises if e.template_exercise_id}
+        result = [overrides.get(te.id, te) for te in self.template.exercises]
+        result.extend(e for e in self.exercises if not e.template_exercise_id)
+        return result
 
 
 # ---------------------- MODELO EXERCISE ----------------------
@@ -95,4 +296,683 @@ class Exercise(db.Model):
     peso = db.Column(db.String(50), nullable=True)
     dia = db.Column(db.String(30), nullable=True)
     notas = db.Column(db.Text, nullable=True)
-    rutina_id = db.Column(db.Integer, db.ForeignKey('routine.id'), nullable=False)
+    rutina_id = db.Column(db.Integer, db.ForeignKey('routine.id'), nullable=False, index=True)
+    # Si no es nulo, este ejercicio reemplaza al de la plantilla para este usuario
+    template_exercise_id = db.Column(db.Integer, db.ForeignKey('template_exercise.id'), nullable=True, index=True)
+    # Posición dentro de la rutina (no tiene por qué ser consecutiva)
+    orden = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        db.Index('ix_exercise_rutina_id_orden', 'rutina_id', 'orden'),
+    )
+
+    from_template = False
+
+
+# ---------------------- MODELO PLANTILLA DE RUTINA ----------------------
+class RoutineTemplate(db.Model):
+    __tablename__ = 'routine_template'
+
+    id = db.Column(db.Integer, primary_key=True)
+    titulo = db.Column(db.String(120), nullable=False)
+    descripcion = db.Column(db.Text, nullable=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    creado_por = db.Column(db.String(150), nullable=True)
+
+    exercises = db.relationship('TemplateExercise', backref='template', lazy=True,
+                                cascade='all,delete-orphan', order_by='TemplateExercise.id')
+
+
+# ---------------------- MODELO EJERCICIO DE PLANTILLA ----------------------
+class TemplateExercise(db.Model):
+    __tablename__ = 'template_exercise'
+
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.String(150), nullable=False)
+    series = db.Column(db.Integer, nullable=True)
+    repeticiones = db.Column(db.String(50), nullable=True)
+    peso = db.Column(db.String(50), nullable=True)
+    dia = db.Column(db.String(30), nullable=True)
+    notas = db.Column(db.Text, nullable=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('routine_template.id'), nullable=False, index=True)
+
+    from_template = True
+
+
+# ---------------------- ASISTENCIA ----------------------
+class CheckIn(db.Model):
+    """Una visita al gimnasio. Se escribe por lotes desde checkins.py."""
+    __tablename__ = 'check_in'
+    __table_args__ = (
+        db.Index('ix_check_in_user_id_created_at', 'user_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Hora local del gimnasio (igual que date.today() para las suscripciones)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class CheckInHourly(db.Model):
+    """Resumen precalculado: visitas por día y hora."""
+    __tablename__ = 'check_in_hourly'
+
+    day = db.Column(db.Date, primary_key=True)
+    hour = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    visits = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CheckInMember(db.Model):
+    """Resumen precalculado: visitas totales y última visita de cada cliente."""
+    __tablename__ = 'check_in_member'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, autoincrement=False)
+    visits = db.Column(db.Integer, nullable=False, default=0)
+    last_visit = db.Column(db.DateTime, nullable=True)
+
+
+# ---------------------- COLA DE TRABAJOS ----------------------
+class Job(db.Model):
+    """Trabajo en segundo plano (ver jobs.py)."""
+    __tablename__ = 'job'
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+        # A lo sumo un trabajo pendiente o en curso por clave: dos workers no
+        # pueden encolar la misma tarea periódica a la vez
+        db.Index('ux_job_unique_key_active', 'unique_key', unique=True,
+                 sqlite_where=text("status IN ('pending', 'running')"),
+                 postgresql_where=text("status IN ('pending', 'running')")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, index=True)
+    unique_key = db.Column(db.String(100), nullable=True)
+    payload = db.Column(db.Text, nullable=True)  # JSON
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending/running/done/failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
+# ---------------------- CONTADORES DE ANALÍTICA ----------------------
+# Tablas pequeñas que se mantienen al escribir (ver _update_analytics_counters
+# más abajo) para que el panel de analítica no recorra user/routine/exercise.
+# Solo cuentan clientes (role != 'admin').
+class SignupDaily(db.Model):
+    """Clientes registrados por día (fecha de created_at)."""
+    __tablename__ = 'stat_signup_daily'
+
+    day = db.Column(db.Date, primary_key=True)
+    members = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Día con el que se cuentan los clientes sin suscripción en stat_subscription_end
+NO_SUBSCRIPTION_DAY = date(1, 1, 1)
+
+
+class SubscriptionEndDaily(db.Model):
+    """Clientes por fecha de vencimiento. El estado depende de la fecha de
+    hoy, así que se guarda el vencimiento y los estados salen de sumar rangos."""
+    __tablename__ = 'stat_subscription_end'
+
+    day = db.Column(db.Date, primary_key=True)
+    members = db.Column(db.Integer, nullable=False, default=0)
+
+
+class CoachStats(db.Model):
+    """Rutinas y ejercicios creados por cada entrenador (Routine.creado_por,
+    '' si no tiene)."""
+    __tablename__ = 'stat_coach'
+
+    coach = db.Column(db.String(150), primary_key=True)
+    routines = db.Column(db.Integer, nullable=False, default=0)
+    exercises = db.Column(db.Integer, nullable=False, default=0)
+
+
+# ---------------------- BÚSQUEDA DE USUARIOS ----------------------
+# Índice FTS5 (solo SQLite) sincronizado con la tabla user mediante triggers.
+USER_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS user_fts USING fts5(
+        nombre, email, phone, client_id,
+        content='user', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS user_fts_ai AFTER INSERT ON user BEGIN
+        INSERT INTO user_fts(rowid, nombre, email, phone, client_id)
+        VALUES (new.id, new.nombre, new.email, new.phone, new.client_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_fts_ad AFTER DELETE ON user BEGIN
+        INSERT INTO user_fts(user_fts, rowid, nombre, email, phone, client_id)
+        VALUES ('delete', old.id, old.nombre, old.email, old.phone, old.client_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS user_fts_au AFTER UPDATE OF nombre, email, phone, client_id ON user BEGIN
+        INSERT INTO user_fts(user_fts, rowid, nombre, email, phone, client_id)
+        VALUES ('delete', old.id, old.nombre, old.email, old.phone, old.client_id);
+        INSERT INTO user_fts(rowid, nombre, email, phone, client_id)
+        VALUES (new.id, new.nombre, new.email, new.phone, new.client_id);
+    END""",
+]
+
+SEARCH_PAGE_SIZE = 25
+SEARCH_MAX_PAGE_SIZE = 100
+
+
+def has_user_fts():
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    row = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type='table' AND name='user_fts'")
+    ).first()
+    return row is not None
+
+
+def ensure_user_search_index():
+    """Crea la tabla FTS5 de usuarios y sus triggers si aún no existen."""
+    if db.engine.dialect.name != 'sqlite':
+        return
+
+    existed = has_user_fts()
+    try:
+        for ddl in USER_FTS_DDL:
+            db.session.execute(text(ddl))
+        if not existed:
+            db.session.execute(text("INSERT INTO user_fts(user_fts) VALUES ('rebuild')"))
+        db.session.commit()
+    except Exception:
+        # SQLite compilado sin FTS5: se usa la búsqueda por prefijo
+        db.session.rollback()
+
+
+def encode_cursor(user):
+    # created_at vacío: el cursor ya está en los clientes sin fecha de alta
+    created_at = user.created_at.isoformat() if user.created_at else ''
+    return f"{created_at}|{user.id}"
+
+
+def decode_cursor(cursor):
+    created_at, user_id = cursor.rsplit('|', 1)
+    return (datetime.fromisoformat(created_at) if created_at else None), int(user_id)
+
+
+def _fts_query(q):
+    tokens = re.findall(r'\w+', q)
+    return ' '.join(f'"{t}"*' for t in tokens)
+
+
+def search_users(q=None, cursor=None, limit=SEARCH_PAGE_SIZE):
+    """Busca clientes (no admin) por nombre, email, teléfono o client_id.
+
+    Devuelve (usuarios, siguiente_cursor). La paginación es por cursor sobre
+    (created_at, id) en orden descendente, así cada página es una lectura
+    acotada por índice sin importar cuántos usuarios haya. Los clientes sin
+    created_at (columna nullable) van al final, ordenados por id.
+    """
+    limit = max(1, min(limit or SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE))
+    query = User.query.filter(User.role != 'admin')
+
+    q = (q or '').strip()
+    if q:
+        match = _fts_query(q)
+        if match and has_user_fts():
+            ids = text("SELECT rowid FROM user_fts WHERE user_fts MATCH :q").bindparams(q=match)
+            query = query.filter(User.id.in_(ids))
+        else:
+            prefix = q.replace('%', '').replace('_', '') + '%'
+            query = query.filter(or_(
+                User.nombre.ilike(prefix),
+                User.email.ilike(prefix),
+                User.phone.like(prefix),
+                User.client_id.like(prefix),
+            ))
+
+    dated = query.filter(User.created_at.isnot(None))
+    undated = query.filter(User.created_at.is_(None))
+    if cursor:
+        created_at, user_id = decode_cursor(cursor)
+        if created_at is None:
+            dated = None
+            undated = undated.filter(User.id < user_id)
+        else:
+            dated = dated.filter(or_(
+                User.created_at < created_at,
+                and_(User.created_at == created_at, User.id < user_id),
+            ))
+
+    users = []
+    if dated is not None:
+        users = dated.order_by(User.created_at.desc(), User.id.desc()).limit(limit + 1).all()
+    if len(users) <= limit:
+        users += undated.order_by(User.id.desc()).limit(limit + 1 - len(users)).all()
+    next_cursor = encode_cursor(users[limit - 1]) if len(users) > limit else None
+    return users[:limit], next_cursor
+
+
+# ---------------------- ESTADO DE SUSCRIPCIONES ----------------------
+SUBSCRIPTION_STATUSES = ('active', 'expiring', 'expired', 'none')
+EXPIRING_DAYS = 7
+
+
+def _subscription_condition(status, within_days, today):
+    """Condición SQL (sobre subscription_end indexado) para cada estado.
+
+    Los estados son disjuntos: 'active' vence después de la ventana,
+    'expiring' vence dentro de los próximos `within_days` días, 'expired'
+    ya venció y 'none' nunca tuvo suscripción.
+    """
+    limit = today + timedelta(days=within_days)
+    if status == 'active':
+        return User.subscription_end > limit
+    if status == 'expiring':
+        return and_(User.subscription_end > today, User.subscription_end <= limit)
+    if status == 'expired':
+        return User.subscription_end <= today
+    if status == 'none':
+        return User.subscription_end.is_(None)
+    raise ValueError(f'Estado de suscripción desconocido: {status}')
+
+
+def users_by_subscription_status(status, within_days=EXPIRING_DAYS, today=None):
+    """Query de clientes en un estado, ordenados por fecha de vencimiento."""
+    today = today or date.today()
+    return (User.query
+            .filter(User.role != 'admin')
+            .filter(_subscription_condition(status, within_days, today))
+            .order_by(User.subscription_end.asc(), User.id.asc()))
+
+
+def subscription_counts(within_days=EXPIRING_DAYS, today=None):
+    """Cantidad de clientes por estado en una sola consulta agregada."""
+    today = today or date.today()
+    columns = [
+        func.coalesce(func.sum(case((_subscription_condition(s, within_days, today), 1), else_=0)), 0)
+        for s in SUBSCRIPTION_STATUSES
+    ]
+    row = db.session.query(*columns).filter(User.role != 'admin').one()
+    return dict(zip(SUBSCRIPTION_STATUSES, (int(v) for v in row)))
+
+
+# ---------------------- CONSULTAS DE RUTINAS ----------------------
+# Cada función carga lo que la vista necesita en un número fijo de
+# consultas, sin importar cuántas rutinas o ejercicios tenga el usuario.
+def _exercise_options():
+    return (
+        selectinload(Routine.exercises),
+        selectinload(Routine.template).selectinload(RoutineTemplate.exercises),
+    )
+
+
+def user_routines_fingerprint(user_id):
+    """(cantidad, id máximo, suma de versiones) de las rutinas del usuario.
+
+    Cambia cuando se crea, borra o modifica cualquiera de sus rutinas; se
+    usa para el ETag de los listados sin cargar las rutinas.
+    """
+    return tuple(db.session.query(
+        func.count(Routine.id),
+        func.max(Routine.id),
+        func.coalesce(func.sum(Routine.version), 0),
+    ).filter(Routine.user_id == user_id).one())
+
+
+def user_routines_query(user_id, with_exercises=False):
+    query = Routine.query.filter_by(user_id=user_id).order_by(Routine.fecha_creacion.desc())
+    if with_exercises:
+        query = query.options(*_exercise_options())
+    return query
+
+
+def get_user_routines(user_id, with_exercises=False):
+    return user_routines_query(user_id, with_exercises).all()
+
+
+def get_routine_or_404(rid, with_exercises=True):
+    query = Routine.query.filter_by(id=rid)
+    if with_exercises:
+        query = query.options(*_exercise_options())
+    return query.first_or_404()
+
+
+def create_routines(titulo, descripcion, user_ids, exercises, creado_por=None, template_id=None):
+    """Crea la misma rutina para varios usuarios en la transacción actual.
+
+    Los ejercicios se insertan con un solo executemany; el commit lo hace
+    quien llama para que todo el lote sea atómico.
+    """
+    routines = [
+        Routine(titulo=titulo, descripcion=descripcion, user_id=uid, creado_por=creado_por,
+                template_id=template_id)
+        for uid in user_ids
+    ]
+    db.session.add_all(routines)
+    db.session.flush()
+
+    if exercises:
+        db.session.execute(
+            insert(Exercise),
+            [dict(ex, rutina_id=r.id, orden=i)
+             for r in routines for i, ex in enumerate(exercises, start=1)],
+        )
+        # El insert directo no pasa por _update_analytics_counters
+        bump_coach_counters(db.session.connection(), creado_por,
+                            exercises=len(routines) * len(exercises))
+    return routines
+
+
+# ---------------------- PLANTILLAS ----------------------
+def create_template(titulo, descripcion, exercises, creado_por=None):
+    template = RoutineTemplate(titulo=titulo, descripcion=descripcion, creado_por=creado_por)
+    db.session.add(template)
+    db.session.flush()
+
+    if exercises:
+        db.session.execute(
+            insert(TemplateExercise),
+            [dict(ex, template_id=template.id) for ex in exercises],
+        )
+    return template
+
+
+def assign_template(template, user_ids, creado_por=None):
+    """Asigna la plantilla a varios usuarios: una fila Routine por usuario
+    y ningún ejercicio copiado."""
+    return create_routines(template.titulo, template.descripcion, user_ids, [],
+                           creado_por=creado_por or template.creado_por,
+                           template_id=template.id)
+
+
+def override_template_exercise(routine, template_exercise, fields):
+    """Personaliza un ejercicio de plantilla solo para esta rutina.
+
+    `fields` trae solo lo que cambia: al crear la personalización el resto
+    se copia de la plantilla; si ya existía, el resto no se toca.
+    """
+    override = Exercise.query.filter_by(rutina_id=routine.id,
+                                        template_exercise_id=template_exercise.id).first()
+    if override is None:
+        override = Exercise(rutina_id=routine.id, template_exercise_id=template_exercise.id)
+        for field in ('nombre', 'series', 'repeticiones', 'peso', 'dia', 'notas'):
+            setattr(override, field, getattr(template_exercise, field))
+        db.session.add(override)
+    for field, value in fields.items():
+        setattr(override, field, value)
+    return override
+
+
+# ---------------------- EDICIÓN DE EJERCICIOS ----------------------
+def add_exercise(routine, fields):
+    """Agrega un ejercicio propio al final de la rutina."""
+    last = (db.session.query(func.max(Exercise.orden))
+            .filter(Exercise.rutina_id == routine.id).scalar())
+    exercise = Exercise(rutina_id=routine.id, orden=(last or 0) + 1, **fields)
+    db.session.add(exercise)
+    return exercise
+
+
+def visible_exercise_count(routine, deleting=()):
+    """Ejercicios que ve el usuario (los de la plantilla más los propios),
+    descontando los propios de `deleting`. Borrar una personalización no
+    cambia el total: vuelve a verse el ejercicio de la plantilla.
+
+    Usa routine.exercises y la plantilla ya cargadas (get_routine_or_404).
+    """
+    deleting = set(deleting)
+    removed = sum(1 for e in routine.exercises if e.id in deleting and not e.template_exercise_id)
+    return len(routine.resolved_exercises()) - removed
+
+
+def apply_exercise_changes(routine, changes):
+    """Aplica un lote validado por forms.parse_exercise_changes.
+
+    Solo se asignan los atributos que cambian, así el flush emite UPDATE
+    únicamente de las filas afectadas (y version sube una sola vez). El
+    commit lo hace quien llama. Lanza ValueError si algún id no es un
+    ejercicio propio de la rutina.
+    """
+    own = {e.id: e for e in routine.exercises}
+    referenced = set(changes['update']) | set(changes['delete']) | set(changes['order'] or ())
+    unknown = sorted(referenced - set(own))
+    if unknown:
+        raise ValueError(f'Ejercicios que no pertenecen a la rutina: {", ".join(map(str, unknown))}')
+
+    for eid in changes['delete']:
+        db.session.delete(own.pop(eid))
+
+    for eid, fields in changes['update'].items():
+        exercise = own[eid]
+        for field, value in fields.items():
+            if getattr(exercise, field) != value:
+                setattr(exercise, field, value)
+
+    if changes['order'] is not None:
+        # Orden final: los ids de "order" primero y luego el resto en su
+        # orden actual. Sin "order" no se renumera nada (orden no tiene que
+        # ser consecutivo)
+        order = [eid for eid in changes['order'] if eid in own]
+        listed = set(order)
+        order.extend(e.id for e in sorted(own.values(), key=lambda e: (e.orden, e.id)) if e.id not in listed)
+        for position, eid in enumerate(order, start=1):
+            if own[eid].orden != position:
+                own[eid].orden = position
+
+    # Los nuevos van al final, como en add_exercise
+    last = max((e.orden for e in own.values()), default=0)
+    created = [Exercise(rutina_id=routine.id, orden=last + i, **fields)
+               for i, fields in enumerate(changes['create'], start=1)]
+    db.session.add_all(created)
+    return created
+
+
+def active_member_ids(user_ids, today=None):
+    """Ids (de la lista) que son clientes con suscripción vigente."""
+    today = today or date.today()
+    rows = (db.session.query(User.id)
+            .filter(User.id.in_(user_ids), User.role != 'admin', User.subscription_end > today)
+            .all())
+    return {row.id for row in rows}
+
+
+# ---------------------- CONTADOR DE CONSULTAS SQL ----------------------
+_counters = threading.local()
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+
+def start_counting():
+    stack = getattr(_counters, 'stack', None)
+    if stack is None:
+        stack = _counters.stack = []
+    counter = QueryCounter()
+    stack.append(counter)
+    return counter
+
+
+def stop_counting(counter):
+    stack = getattr(_counters, 'stack', [])
+    if counter in stack:
+        stack.remove(counter)
+
+
+@contextmanager
+def count_queries():
+    """Cuenta las sentencias SQL ejecutadas en el hilo actual.
+
+        with count_queries() as counter:
+            client.get('/routine/1')
+        assert counter.count <= 3
+    """
+    counter = start_counting()
+    try:
+        yield counter
+    finally:
+        stop_counting(counter)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    for counter in getattr(_counters, 'stack', ()):
+        counter.count += 1
+        counter.statements.append(statement)
+
+
+# ---------------------- INVALIDACIÓN DE LA CACHÉ DE USUARIOS ----------------------
+# Cualquier commit que cree, modifique o borre un User (registro, suscripción,
+# eliminación...) saca a ese usuario de la caché de user_loader.
+def _user_cache():
+    if has_app_context():
+        return current_app.extensions.get('nova_user_cache')
+    return None
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault('nova_changed_users', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            changed.add(obj.id)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _invalidate_changed_users(session):
+    changed = session.info.pop('nova_changed_users', None)
+    cache = _user_cache()
+    if changed and cache is not None:
+        for user_id in changed:
+            cache.delete(user_id)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _discard_changed_users(session):
+    session.info.pop('nova_changed_users', None)
+
+
+# ---------------------- VERSIÓN DE RUTINAS ----------------------
+@event.listens_for(RoutingSession, 'after_flush')
+def _bump_routine_versions(session, flush_context):
+    """Sube version/updated_at de las rutinas tocadas en este flush."""
+    routine_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Exercise) and obj.rutina_id is not None:
+            routine_ids.add(obj.rutina_id)
+        elif (isinstance(obj, Routine) and obj in session.dirty
+              and session.is_modified(obj, include_collections=False)):
+            routine_ids.add(obj.id)
+
+    if routine_ids:
+        session.connection().execute(
+            update(Routine.__table__)
+            .where(Routine.__table__.c.id.in_(routine_ids))
+            .values(version=Routine.__table__.c.version + 1, updated_at=datetime.utcnow())
+        )
+
+
+# ---------------------- CONTADORES DE ANALÍTICA ----------------------
+def upsert(table, dialect):
+    """INSERT ... ON CONFLICT del dialecto (SQLite o PostgreSQL)."""
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(table)
+
+
+def _add_to_counters(connection, model, deltas):
+    """Suma {clave: cantidad} (o {clave: (rutinas, ejercicios)} en
+    CoachStats) a las filas de contadores, creándolas si no existen."""
+    deltas = {key: value for key, value in deltas.items() if value not in (0, (0, 0))}
+    if not deltas:
+        return
+    table = model.__table__
+    key = table.primary_key.columns.values()[0].name
+    values = [c.name for c in table.columns if c.name != key]
+    stmt = upsert(table, connection.dialect.name)
+    stmt = stmt.on_conflict_do_update(index_elements=[key],
+                                      set_={c: table.c[c] + stmt.excluded[c] for c in values})
+    rows = []
+    for k, value in deltas.items():
+        value = value if isinstance(value, tuple) else (value,)
+        rows.append({key: k, **dict(zip(values, value))})
+    connection.execute(stmt, rows)
+
+
+def bump_member_counters(connection, signups=None, ends=None):
+    """signups: {día: n}; ends: {vencimiento o None: n}. n puede ser negativo."""
+    _add_to_counters(connection, SignupDaily, signups or {})
+    _add_to_counters(connection, SubscriptionEndDaily,
+                     {end or NO_SUBSCRIPTION_DAY: n for end, n in (ends or {}).items()})
+
+
+def bump_coach_counters(connection, coach, routines=0, exercises=0):
+    _add_to_counters(connection, CoachStats, {coach or '': (routines, exercises)})
+
+
+def _signup_day(user):
+    return (user.created_at or datetime.utcnow()).date()
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _update_analytics_counters(session, flush_context):
+    """Actualiza los contadores con lo que cambió en este flush (misma
+    transacción: si se hace rollback, los contadores también vuelven atrás).
+
+    Cubre las escrituras del ORM; las sentencias directas (insert/delete de
+    Core) llaman a bump_*_counters por su cuenta.
+    """
+    signups, ends, coaches = {}, {}, {}
+
+    def add(counter, key, n):
+        counter[key] = counter.get(key, 0) + n
+
+    def add_coach(coach, routines=0, exercises=0):
+        r, e = coaches.get(coach or '', (0, 0))
+        coaches[coach or ''] = (r + routines, e + exercises)
+
+    exercises = []
+    routines = {}
+    for sign, objects in ((1, session.new), (-1, session.deleted)):
+        for obj in objects:
+            if isinstance(obj, User) and obj.role != 'admin':
+                add(signups, _signup_day(obj), sign)
+                add(ends, obj.subscription_end, sign)
+            elif isinstance(obj, Routine):
+                routines[obj.id] = obj.creado_por
+                add_coach(obj.creado_por, routines=sign)
+            elif isinstance(obj, Exercise):
+                exercises.append((sign, obj.rutina_id))
+
+    for obj in session.dirty:
+        if isinstance(obj, User) and obj.role != 'admin':
+            history = inspect(obj).attrs.subscription_end.history
+            if history.added or history.deleted:
+                for end in history.deleted:
+                    add(ends, end, -1)
+                for end in history.added:
+                    add(ends, end, 1)
+
+    if exercises:
+        # El entrenador de cada ejercicio es el de su rutina: primero las que
+        # ya están en la sesión y, las demás, en una sola consulta
+        for obj in session.identity_map.values():
+            if isinstance(obj, Routine):
+                routines.setdefault(obj.id, obj.creado_por)
+        missing = {rid for _, rid in exercises if rid not in routines}
+        if missing:
+            rows = session.connection().execute(
+                select(Routine.__table__.c.id, Routine.__table__.c.creado_por)
+                .where(Routine.__table__.c.id.in_(missing)))
+            for rid, creado_por in rows:
+                routines[rid] = creado_por
+        for sign, rid in exercises:
+            add_coach(routines.get(rid), exercises=sign)
+
+    if signups or ends or coaches:
+        connection = session.connection()
+        bump_member_counters(connection, signups, ends)
+        _add_to_counters(connection, CoachStats, coaches)
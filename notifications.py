@@ -0,0 +1,94 @@
+# ==========================
+# notifications.py
+# ==========================
+# Envío de mensajes a los clientes (WhatsApp al número de User.phone).
+#
+# El transporte se elige con NOTIFY_TRANSPORT:
+#   'log'       solo escribe en el log (por defecto, desarrollo)
+#   'memory'    guarda los mensajes en .sent (pruebas)
+#   'whatsapp'  WhatsApp Cloud API (WHATSAPP_TOKEN, WHATSAPP_PHONE_ID)
+#   o la ruta importable a una clase propia con send(to, message).
+
+import json
+import logging
+import re
+import urllib.request
+
+from flask import current_app
+from werkzeug.utils import import_string
+
+
+log = logging.getLogger('nova.notify')
+
+
+class NotificationError(Exception):
+    """El transporte rechazó el mensaje (se reintenta desde la cola)."""
+
+
+# ---------------------- TRANSPORTES ----------------------
+class LogTransport:
+    def send(self, to, message):
+        log.info('Mensaje para %s: %s', to, message)
+
+
+class MemoryTransport:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, to, message):
+        self.sent.append((to, message))
+
+
+class WhatsAppTransport:
+    API_URL = 'https://graph.facebook.com/v19.0/{phone_id}/messages'
+
+    def __init__(self, token, phone_id, timeout=10):
+        self.token = token
+        self.url = self.API_URL.format(phone_id=phone_id)
+        self.timeout = timeout
+
+    def send(self, to, message):
+        body = json.dumps({'messaging_product': 'whatsapp', 'to': to, 'type': 'text',
+                           'text': {'body': message}}).encode('utf-8')
+        req = urllib.request.Request(self.url, data=body, method='POST', headers={
+            'Authorization': f'Bearer {self.token}',
+            'Content-Type': 'application/json',
+        })
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                response.read()
+        except OSError as exc:
+            raise NotificationError(f'WhatsApp rechazó el mensaje a {to}: {exc}') from exc
+
+
+def make_transport(backend='log', config=None):
+    if not isinstance(backend, str):
+        return backend
+    config = config or {}
+    if backend == 'log':
+        return LogTransport()
+    if backend == 'memory':
+        return MemoryTransport()
+    if backend == 'whatsapp':
+        return WhatsAppTransport(config.get('WHATSAPP_TOKEN'), config.get('WHATSAPP_PHONE_ID'))
+    return import_string(backend)()
+
+
+# ---------------------- ENVÍO ----------------------
+def normalize_phone(phone, country_code='57'):
+    """Número en formato internacional sin '+' (lo que espera WhatsApp), o None."""
+    digits = re.sub(r'\D', '', phone or '')
+    if len(digits) < 7:
+        return None
+    if len(digits) <= 10:
+        digits = country_code + digits
+    return digits
+
+
+def notify(phone, message):
+    """Envía con el transporte de la app. Devuelve False si el número no sirve."""
+    to = normalize_phone(phone, current_app.config['NOTIFY_COUNTRY_CODE'])
+    if to is None:
+        return False
+    current_app.extensions['nova_notifier'].send(to, message)
+    return True
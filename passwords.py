@@ -0,0 +1,182 @@
+# ==========================
+# passwords.py
+# ==========================
+# Hash de contraseñas fuera del hilo de la petición.
+#
+# scrypt/pbkdf2 son caros a propósito; en hora pico los logins ocupaban
+# todos los workers. Aquí el cálculo se hace en un pool de procesos acotado
+# (PASSWORD_HASH_WORKERS) con un máximo de trabajos en espera
+# (PASSWORD_HASH_MAX_PENDING): si el pool está saturado la petición falla
+# rápido con HasherBusy en vez de encolarse sin límite.
+#
+# Los parámetros (PASSWORD_HASH_METHOD, PASSWORD_SALT_LENGTH) se pueden
+# cambiar en cualquier momento: al iniciar sesión, un hash con parámetros
+# viejos se recalcula con los nuevos (needs_rehash).
+
+import atexit
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+log = logging.getLogger('nova.passwords')
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_SALT_LENGTH = 16
+
+
+class HasherBusy(Exception):
+    """No hay lugar en el pool de hash dentro del tiempo de espera."""
+
+
+def hash_params():
+    """(método, largo de la sal) de la configuración de la app, si hay app."""
+    if has_app_context():
+        return (current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+                current_app.config.get('PASSWORD_SALT_LENGTH', DEFAULT_SALT_LENGTH))
+    return DEFAULT_METHOD, DEFAULT_SALT_LENGTH
+
+
+def make_password_hash(password, method=None, salt_length=None):
+    """generate_password_hash con los parámetros configurados (en este proceso)."""
+    default_method, default_salt = hash_params()
+    return generate_password_hash(password, method=method or default_method,
+                                  salt_length=salt_length or default_salt)
+
+
+def _method_of(pwhash):
+    return (pwhash or '').split('$', 1)[0]
+
+
+def _salt_length_of(pwhash):
+    parts = (pwhash or '').split('$')
+    return len(parts[1]) if len(parts) == 3 else None
+
+
+# ---------------------- POOL ----------------------
+class PasswordHasher:
+    """Hash y verificación en un pool de procesos con concurrencia acotada.
+
+    Con workers=0 se calcula en el propio hilo (desarrollo y pruebas), pero
+    igual respeta el límite de trabajos simultáneos.
+    """
+
+    def __init__(self, method=DEFAULT_METHOD, salt_length=DEFAULT_SALT_LENGTH, workers=None,
+                 max_pending=None, timeout=5.0):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = multiprocessing.cpu_count() if workers is None else workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending or max(1, self.workers) * 4)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._current_prefix = None
+        self._atexit_registered = False
+
+    def _executor(self):
+        # Se crea al primer uso, ya dentro del worker (después del fork del
+        # servidor), y con "spawn" para no clonar los hilos de la app.
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+                    if not self._atexit_registered:
+                        # Los procesos del pool no mueren solos con el padre
+                        atexit.register(self.shutdown)
+                        self._atexit_registered = True
+        return self._pool
+
+    def _discard_pool(self, pool):
+        """Saca del servicio un pool roto (solo el primer hilo que lo note)."""
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args):
+        pool = self._executor()
+        try:
+            return pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # Un proceso del pool murió (OOM, kill): se reintenta una vez en
+            # un pool nuevo y, si también falla, en el propio hilo
+            log.warning('El pool de hash de contraseñas se rompió; se crea uno nuevo.')
+            self._discard_pool(pool)
+            pool = self._executor()
+            try:
+                return pool.submit(fn, *args).result()
+            except BrokenProcessPool:
+                log.error('El pool de hash de contraseñas se rompió otra vez; se calcula en el hilo.')
+                self._discard_pool(pool)
+                return fn(*args)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HasherBusy()
+        try:
+            if self.workers == 0:
+                return fn(*args)
+            return self._submit(fn, *args)
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True si el hash se calculó con otro método, costo o largo de sal."""
+        if self._current_prefix is None:
+            # werkzeug normaliza el método ("scrypt" -> "scrypt:32768:8:1")
+            self._current_prefix = _method_of(generate_password_hash('', self.method, 1))
+        return (_method_of(pwhash) != self._current_prefix
+                or _salt_length_of(pwhash) != self.salt_length)
+
+    def shutdown(self, wait=True):
+        """Termina los procesos del pool (al salir del proceso o del worker)."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+# ---------------------- LÍMITE DE INTENTOS ----------------------
+class RateLimiter:
+    """Ventana fija de intentos por clave (correo o IP) sobre una caché de cache.py.
+
+    Con la caché local el límite es por proceso; con una caché compartida
+    (RATE_LIMIT_BACKEND apuntando a Redis, etc.) vale para todos los workers.
+    """
+
+    def __init__(self, cache, limit, window, clock=time.time):
+        self.cache = cache
+        self.limit = limit
+        self.window = window
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def _key(self, scope, value):
+        return f'ratelimit:{scope}:{value}:{int(self._clock() // self.window)}'
+
+    def hit(self, scope, value):
+        """Cuenta un intento; False si ya se pasó del límite en esta ventana."""
+        if not self.limit or not value:
+            return True
+        key = self._key(scope, value)
+        with self._lock:
+            count = (self.cache.get(key) or 0) + 1
+            self.cache.set(key, count, ttl=self.window)
+        return count <= self.limit
+
+    def reset(self, scope, value):
+        if value:
+            self.cache.delete(self._key(scope, value))
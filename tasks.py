@@ -0,0 +1,135 @@
+# ==========================
+# tasks.py
+# ==========================
+# Tareas de la cola (jobs.py): recordatorios de vencimiento, limpieza de
+# clientes vencidos y recálculo de estadísticas y contadores. Las que recorren muchos
+# usuarios los procesan por lotes de ids (keyset), nunca todos a la vez.
+
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import Integer, cast, delete, extract, func, insert, or_, select
+
+from analytics import forget_members, rebuild_counters
+from jobs import enqueue, task
+from models import db, User, Routine, Exercise, CheckIn, CheckInHourly, CheckInMember
+from notifications import NotificationError, notify
+
+
+BATCH_SIZE = 200
+REMINDER_ROUNDS = 3
+DAY = 24 * 3600
+
+
+def _id_batches(query, batch_size=BATCH_SIZE):
+    """Ids del query en lotes ascendentes, una consulta por lote."""
+    last_id = 0
+    while True:
+        ids = [row.id for row in query.filter(User.id > last_id).order_by(User.id).limit(batch_size)]
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+# ---------------------- RECORDATORIOS ----------------------
+@task('subscription_reminders', every=DAY)
+def subscription_reminders(payload):
+    """Encola un trabajo de envío por cada lote de clientes que vencen en los
+    próximos NOTIFY_REMINDER_DAYS días y aún no recibieron el aviso de ese
+    vencimiento. Es una ventana y no un día exacto: un día en que la tarea no
+    corrió (worker caído, horario corrido) no deja a nadie sin aviso."""
+    days = current_app.config['NOTIFY_REMINDER_DAYS']
+    today = date.today()
+    query = (db.session.query(User.id)
+             .filter(User.role != 'admin', User.phone.isnot(None),
+                     User.subscription_end > today,
+                     User.subscription_end <= today + timedelta(days=days),
+                     or_(User.reminder_sent_for.is_(None), User.reminder_sent_for != User.subscription_end)))
+    for ids in _id_batches(query):
+        enqueue('send_reminders', {'user_ids': ids})
+
+
+@task('send_reminders', max_attempts=3)
+def send_reminders(payload):
+    """Envía el recordatorio a un lote y marca el vencimiento avisado. Los
+    envíos que fallan se reintentan en otro trabajo solo con esos clientes,
+    para no repetir los que salieron."""
+    users = User.query.filter(User.id.in_(payload['user_ids'])).all()
+    failed = []
+    for user in users:
+        if user.subscription_end is None or user.reminder_sent_for == user.subscription_end:
+            continue
+        days = user.days_remaining()
+        message = (f'Hola {user.nombre}, tu suscripción en NOVA vence en {days} '
+                   f'día{"s" if days != 1 else ""}. ¡Te esperamos para renovarla!')
+        try:
+            notify(user.phone, message)
+        except NotificationError:
+            failed.append(user.id)
+            continue
+        # También si el número no sirve (notify devuelve False): no se reintenta
+        user.reminder_sent_for = user.subscription_end
+
+    round_ = payload.get('round', 1)
+    if failed and round_ < REMINDER_ROUNDS:
+        enqueue('send_reminders', {'user_ids': failed, 'round': round_ + 1},
+                run_at=datetime.utcnow() + timedelta(minutes=10 * round_))
+    elif failed:
+        raise NotificationError(f'No se pudo avisar a {len(failed)} clientes.')
+
+
+# ---------------------- LIMPIEZA ----------------------
+@task('cleanup_expired_members', every=DAY)
+def cleanup_expired_members(payload):
+    """Borra clientes vencidos hace más de MEMBER_RETENTION_DAYS días, con
+    sus rutinas, ejercicios y asistencias. Desactivada con 0 (por defecto)."""
+    retention = current_app.config['MEMBER_RETENTION_DAYS']
+    if not retention:
+        return
+    cutoff = date.today() - timedelta(days=retention)
+    query = db.session.query(User.id).filter(User.role != 'admin', User.subscription_end < cutoff)
+
+    # Cada lote es una transacción; el siguiente lote vuelve a consultar
+    # desde el principio porque los anteriores ya no existen
+    while True:
+        ids = [row.id for row in query.order_by(User.id).limit(BATCH_SIZE)]
+        if not ids:
+            return
+        forget_members(ids)
+        routine_ids = select(Routine.id).where(Routine.user_id.in_(ids)).scalar_subquery()
+        db.session.execute(delete(Exercise).where(Exercise.rutina_id.in_(routine_ids)))
+        db.session.execute(delete(Routine).where(Routine.user_id.in_(ids)))
+        db.session.execute(delete(CheckIn).where(CheckIn.user_id.in_(ids)))
+        db.session.execute(delete(CheckInMember).where(CheckInMember.user_id.in_(ids)))
+        db.session.execute(delete(User).where(User.id.in_(ids)))
+        # Los DELETE directos no pasan por los eventos del ORM: se invalida a mano
+        db.session.info.setdefault('nova_changed_users', set()).update(ids)
+        db.session.commit()
+
+
+# ---------------------- ESTADÍSTICAS ----------------------
+@task('recompute_checkin_rollups', every=7 * DAY)
+def recompute_checkin_rollups(payload):
+    """Reconstruye los resúmenes de asistencia desde check_in (corrige
+    cualquier diferencia, p. ej. visitas de clientes ya borrados)."""
+    if db.engine.dialect.name == 'sqlite':
+        hour = cast(func.strftime('%H', CheckIn.created_at), Integer)
+    else:
+        hour = cast(extract('hour', CheckIn.created_at), Integer)
+    day = func.date(CheckIn.created_at)
+
+    db.session.execute(delete(CheckInHourly))
+    db.session.execute(insert(CheckInHourly).from_select(
+        ['day', 'hour', 'visits'],
+        select(day, hour, func.count()).group_by(day, hour)))
+    db.session.execute(delete(CheckInMember))
+    db.session.execute(insert(CheckInMember).from_select(
+        ['user_id', 'visits', 'last_visit'],
+        select(CheckIn.user_id, func.count(), func.max(CheckIn.created_at)).group_by(CheckIn.user_id)))
+
+
+@task('rebuild_analytics_counters', every=7 * DAY)
+def rebuild_analytics_counters(payload):
+    """Recalcula los contadores del panel de analítica (analytics.py)."""
+    rebuild_counters()
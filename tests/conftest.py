@@ -0,0 +1,89 @@
+# ==========================
+# tests/conftest.py
+# ==========================
+# App sobre una base SQLite temporal con las migraciones aplicadas y datos
+# suficientes para que una consulta N+1 se note (varias rutinas por
+# usuario, varios ejercicios por rutina, rutinas de plantilla).
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from migrations import upgrade  # noqa: E402
+from models import db, User, create_routines, create_template, assign_template  # noqa: E402
+from passwords import make_password_hash  # noqa: E402
+
+
+PASSWORD = 'secreto123'
+USERS = 10
+ROUTINES_PER_USER = 4
+EXERCISES_PER_ROUTINE = 5
+
+
+def make_app(db_path, **config):
+    app = create_app(dict({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'WTF_CSRF_ENABLED': False,
+        'SQL_QUERY_BUDGET_ENFORCE': True,
+        # Hash rápido y en el mismo hilo
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'PASSWORD_HASH_WORKERS': 0,
+        'CHECKIN_BUFFERED': False,
+        'NOTIFY_TRANSPORT': 'memory',
+    }, **config))
+    with app.app_context():
+        upgrade(echo=lambda *a: None)
+    return app
+
+
+@pytest.fixture
+def app_config(request):
+    """Configuración extra de la app; una prueba la cambia con parametrize indirecto."""
+    return getattr(request, 'param', {})
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    app = make_app(tmp_path / 'test.db', **app_config)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def seeded(app):
+    """Ids del admin, de los clientes y de una rutina (propia y de plantilla) del primero."""
+    with app.app_context():
+        pwhash = make_password_hash(PASSWORD)
+        admin = User(nombre='Admin', email='admin@nova.test', role='admin', password_hash=pwhash)
+        members = [User(nombre=f'Cliente {i}', email=f'cliente{i}@nova.test', password_hash=pwhash)
+                   for i in range(USERS)]
+        db.session.add(admin)
+        db.session.add_all(members)
+        db.session.flush()
+
+        member_ids = [m.id for m in members]
+        exercises = [{'nombre': f'Ejercicio {i}', 'series': 3, 'repeticiones': '10'}
+                     for i in range(EXERCISES_PER_ROUTINE)]
+        for n in range(ROUTINES_PER_USER - 1):
+            routines = create_routines(f'Rutina {n}', 'Descripción', member_ids, exercises,
+                                       creado_por='Admin')
+        template = create_template('Plantilla', 'Base', exercises, creado_por='Admin')
+        assign_template(template, member_ids)
+        db.session.commit()
+        return {'admin': admin.id, 'members': member_ids, 'routine': routines[0].id}
+
+
+def post_login(client, email, password=PASSWORD, **kwargs):
+    return client.post('/', data={'form-type': 'login', 'email': email, 'password': password}, **kwargs)
+
+
+def login(client, email, password=PASSWORD):
+    response = post_login(client, email, password)
+    assert response.status_code == 302
+    return client
@@ -0,0 +1,50 @@
+# ==========================
+# tests/test_analytics.py
+# ==========================
+# Los contadores stat_* deben quedar iguales a recalcularlos desde cero
+# después de cada escritura.
+
+from analytics import rebuild_counters
+from conftest import login
+from models import db, CoachStats, Exercise, SignupDaily, SubscriptionEndDaily
+
+
+def _counters():
+    return (sorted((r.day, r.members) for r in SignupDaily.query if r.members),
+            sorted((r.day, r.members) for r in SubscriptionEndDaily.query if r.members),
+            sorted((r.coach, r.routines, r.exercises) for r in CoachStats.query if r.routines or r.exercises))
+
+
+def _assert_counters_match_rebuild():
+    incremental = _counters()
+    rebuild_counters()
+    db.session.flush()
+    try:
+        assert incremental == _counters()
+    finally:
+        db.session.rollback()
+
+
+def test_delete_exercise_in_fresh_session(app, seeded):
+    # La rutina del ejercicio no está en la sesión de la petición: el
+    # entrenador se busca con una consulta durante el flush
+    with app.app_context():
+        eid = Exercise.query.filter_by(rutina_id=seeded['routine']).first().id
+        before = CoachStats.query.filter_by(coach='Admin').one().exercises
+
+    client = login(app.test_client(), 'admin@nova.test')
+    response = client.post(f'/admin/exercise/{eid}/delete')
+    assert response.status_code == 200
+
+    with app.app_context():
+        assert db.session.get(Exercise, eid) is None
+        assert CoachStats.query.filter_by(coach='Admin').one().exercises == before - 1
+        _assert_counters_match_rebuild()
+
+
+def test_analytics_summary_counts_members(app, seeded):
+    client = login(app.test_client(), 'admin@nova.test')
+    summary = client.get('/admin/analytics?format=json').get_json()
+    assert summary['clientes'] == len(seeded['members'])
+    assert summary['suscripciones']['none'] == len(seeded['members'])
+    assert summary['altas_semana'] == len(seeded['members'])
@@ -0,0 +1,36 @@
+# ==========================
+# tests/test_api.py
+# ==========================
+
+from datetime import timedelta, timezone
+
+from conftest import login
+from models import db, Routine, count_queries
+
+
+def test_since_with_offset_is_compared_in_utc(app, seeded):
+    with app.app_context():
+        updated_at = db.session.get(Routine, seeded['routine']).updated_at
+    client = login(app.test_client(), 'cliente0@nova.test')
+
+    # Media hora antes del cambio, escrita con offset +05:00
+    since = (updated_at - timedelta(minutes=30)).replace(tzinfo=timezone.utc)
+    since = since.astimezone(timezone(timedelta(hours=5))).isoformat()
+    changed = client.get('/api/v1/me/routines/changes', query_string={'since': since}).get_json()['changed']
+    assert seeded['routine'] in [r['id'] for r in changed]
+
+    # Media hora después, en hora de Bogotá (UTC-5)
+    since = (updated_at + timedelta(minutes=30)).replace(tzinfo=timezone.utc)
+    since = since.astimezone(timezone(timedelta(hours=-5))).isoformat()
+    changed = client.get('/api/v1/me/routines/changes', query_string={'since': since}).get_json()['changed']
+    assert changed == []
+
+
+def test_routine_detail_loads_routine_once(app, seeded):
+    client = login(app.test_client(), 'cliente0@nova.test')
+    with count_queries() as counter:
+        response = client.get(f'/api/v1/routines/{seeded["routine"]}')
+    assert response.status_code == 200
+    assert len(response.get_json()['exercises']) > 0
+    from_routine = [s for s in counter.statements if 'FROM routine' in s]
+    assert len(from_routine) == 1, from_routine
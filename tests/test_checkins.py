@@ -0,0 +1,120 @@
+# ==========================
+# tests/test_checkins.py
+# ==========================
+# Con CHECKIN_BUFFERED las visitas esperan en la cola hasta flush(); aquí
+# no se arranca el hilo del writer para que cada prueba decida cuándo se
+# escribe.
+
+import queue
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from checkins import member_for_checkin
+from conftest import login
+from models import db, CheckIn, CheckInHourly, CheckInMember, User
+
+pytestmark = pytest.mark.parametrize('app_config', [{'CHECKIN_BUFFERED': True}], indirect=True)
+
+
+@pytest.fixture
+def writer(app, monkeypatch):
+    writer = app.extensions['nova_checkins']
+    monkeypatch.setattr(writer, '_ensure_thread', lambda: None)
+    return writer
+
+
+@pytest.fixture
+def member(app, seeded):
+    """Primer cliente con suscripción vigente: (id, client_id)."""
+    with app.app_context():
+        user = db.session.get(User, seeded['members'][0])
+        user.subscription_date = date.today()
+        user.subscription_days = 30
+        db.session.commit()
+        return user.id, user.client_id
+
+
+def test_member_for_checkin(app, seeded, member):
+    with app.app_context():
+        assert member_for_checkin('00000000') == (None, 'Cliente no encontrado.')
+        user, error = member_for_checkin(member[1])
+        assert (user.id, error) == (member[0], None)
+
+        expired = db.session.get(User, seeded['members'][1])
+        expired.subscription_date = date.today() - timedelta(days=40)
+        expired.subscription_days = 30
+        db.session.commit()
+        assert member_for_checkin(expired.client_id)[1] == 'La suscripción no está vigente.'
+
+
+def test_buffered_visits_and_rollups(app, member, writer):
+    user_id = member[0]
+    first = datetime(2026, 1, 5, 6, 10)
+    with app.app_context():
+        writer.submit(user_id, first)
+        writer.submit(user_id, first + timedelta(minutes=20))
+        writer.submit(user_id, first + timedelta(hours=1))
+        assert CheckIn.query.count() == 0
+
+        writer.flush()
+        assert CheckIn.query.filter_by(user_id=user_id).count() == 3
+        hourly = {(r.day, r.hour): r.visits for r in CheckInHourly.query}
+        assert hourly == {(first.date(), 6): 2, (first.date(), 7): 1}
+        stats = db.session.get(CheckInMember, user_id)
+        assert (stats.visits, stats.last_visit) == (3, first + timedelta(hours=1))
+
+        # Un segundo lote suma sobre las filas existentes (upsert)
+        writer.submit(user_id, first - timedelta(days=1))
+        writer.flush()
+        db.session.expire_all()
+        stats = db.session.get(CheckInMember, user_id)
+        assert (stats.visits, stats.last_visit) == (4, first + timedelta(hours=1))
+
+
+def test_checkin_route_queues_visit(app, member, writer):
+    client = login(app.test_client(), 'admin@nova.test')
+    response = client.post('/admin/checkin', json={'client_id': member[1]})
+    assert response.status_code == 202
+    with app.app_context():
+        assert CheckIn.query.count() == 0
+        writer.flush()
+        assert CheckIn.query.filter_by(user_id=member[0]).count() == 1
+
+
+def test_full_queue_writes_synchronously(app, member, writer, monkeypatch):
+    def full(*args, **kwargs):
+        raise queue.Full
+    monkeypatch.setattr(writer, 'submit', full)
+
+    client = login(app.test_client(), 'admin@nova.test')
+    response = client.post('/admin/checkin', json={'client_id': member[1]})
+    assert response.status_code == 202
+    with app.app_context():
+        assert CheckIn.query.filter_by(user_id=member[0]).count() == 1
+
+
+def test_deleted_member_visits_are_dropped(app, seeded, member, writer):
+    other = seeded['members'][2]
+    with app.app_context():
+        writer.submit(member[0])
+        writer.submit(other)
+        # Borrado por otro proceso: su cola no se vació antes
+        db.session.delete(db.session.get(User, member[0]))
+        db.session.commit()
+
+        writer.flush()
+        assert CheckIn.query.filter_by(user_id=member[0]).count() == 0
+        assert db.session.get(CheckInMember, member[0]) is None
+        assert CheckIn.query.filter_by(user_id=other).count() == 1
+
+
+def test_delete_user_flushes_pending_visits(app, member, writer):
+    client = login(app.test_client(), 'admin@nova.test')
+    client.post('/admin/checkin', json={'client_id': member[1]})
+    client.post(f'/admin/user/{member[0]}/delete')
+    with app.app_context():
+        assert db.session.get(User, member[0]) is None
+        writer.flush()
+        assert CheckIn.query.count() == 0
+        assert CheckInMember.query.count() == 0
@@ -0,0 +1,28 @@
+# ==========================
+# tests/test_client_ids.py
+# ==========================
+
+from models import db, User, count_queries
+
+
+def test_constructing_user_does_not_touch_db(app):
+    with app.app_context():
+        with count_queries() as counter:
+            user = User(nombre='Nuevo', email='nuevo@nova.test')
+        assert counter.count == 0
+        assert user.client_id is None
+
+
+def test_client_ids_assigned_on_flush_with_one_update(app):
+    with app.app_context():
+        users = [User(nombre=f'Nuevo {i}', email=f'nuevo{i}@nova.test', password_hash='x')
+                 for i in range(5)]
+        db.session.add_all(users)
+        with count_queries() as counter:
+            db.session.flush()
+        sequence = [s for s in counter.statements if 'id_sequence' in s]
+        assert len(sequence) == 1 and 'RETURNING' in sequence[0]
+
+        ids = [u.client_id for u in users]
+        assert len(set(ids)) == 5 and all(len(cid) == 8 and cid.isdigit() for cid in ids)
+        db.session.commit()
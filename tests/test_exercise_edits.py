@@ -0,0 +1,48 @@
+# ==========================
+# tests/test_exercise_edits.py
+# ==========================
+
+from sqlalchemy import update
+
+from conftest import EXERCISES_PER_ROUTINE, login
+from models import db, count_queries, Exercise, Routine
+
+
+def test_single_field_update_touches_one_row(app, seeded):
+    rid = seeded['routine']
+    with app.app_context():
+        # Como quedan tras la migración 0010 (orden = id): no consecutivos
+        db.session.execute(update(Exercise).where(Exercise.rutina_id == rid).values(orden=Exercise.id * 10))
+        db.session.commit()
+        eid = Exercise.query.filter_by(rutina_id=rid).first().id
+
+    client = login(app.test_client(), 'admin@nova.test')
+    with count_queries() as counter:
+        response = client.post(f'/admin/exercise/{eid}/update', json={'notas': 'x'})
+    assert response.get_json()['ok']
+    updates = [s for s in counter.statements if s.startswith('UPDATE exercise')]
+    assert len(updates) == 1
+
+
+def test_batch_appends_new_exercises_after_last(app, seeded):
+    rid = seeded['routine']
+    client = login(app.test_client(), 'admin@nova.test')
+    response = client.post(f'/admin/routine/{rid}/exercises/batch', json={'create': [{'nombre': 'Nuevo'}]})
+    new_id = response.get_json()['created'][0]
+    with app.app_context():
+        ordenes = [e.orden for e in db.session.get(Routine, rid).exercises]
+        assert db.session.get(Exercise, new_id).orden == max(ordenes)
+        assert ordenes == sorted(ordenes) and len(set(ordenes)) == len(ordenes)
+
+
+def test_exercise_limit_counts_template_exercises(app, seeded, monkeypatch):
+    monkeypatch.setattr('app.MAX_EXERCISES_PER_ROUTINE', EXERCISES_PER_ROUTINE + 1)
+    with app.app_context():
+        rid = Routine.query.filter(Routine.user_id == seeded['members'][0],
+                                   Routine.template_id.isnot(None)).one().id
+    client = login(app.test_client(), 'admin@nova.test')
+
+    assert client.post(f'/admin/routine/{rid}/exercise', json={'nombre': 'Extra'}).status_code == 201
+    assert client.post(f'/admin/routine/{rid}/exercise', json={'nombre': 'Otro'}).status_code == 400
+    batch = client.post(f'/admin/routine/{rid}/exercises/batch', json={'create': [{'nombre': 'Otro'}]})
+    assert batch.status_code == 400
@@ -0,0 +1,23 @@
+# ==========================
+# tests/test_export.py
+# ==========================
+
+import pytest
+
+from conftest import login
+
+
+@pytest.mark.parametrize('url', ['/admin/export/foo.csv', '/admin/export/users.xml'])
+def test_invalid_export_is_404(app, seeded, url):
+    client = login(app.test_client(), 'admin@nova.test')
+    assert client.get(url).status_code == 404
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'jsonl'])
+def test_export_streams_every_user(app, seeded, fmt):
+    client = login(app.test_client(), 'admin@nova.test')
+    response = client.get(f'/admin/export/users.{fmt}')
+    assert response.status_code == 200
+    lines = response.get_data(as_text=True).strip().splitlines()
+    header = 1 if fmt == 'csv' else 0
+    assert len(lines) == header + len(seeded['members']) + 1  # + admin
@@ -0,0 +1,54 @@
+# ==========================
+# tests/test_import.py
+# ==========================
+
+import io
+
+from sqlalchemy import insert
+
+import member_io
+from conftest import login, post_login
+from models import db, User
+
+
+CSV = 'nombre,email,password\n' + ''.join(
+    f'Importado {i},importado{i}@nova.test,clave{i}123\n' for i in range(3))
+
+
+def _upload(client):
+    return client.post('/admin/import', data={'file': (io.BytesIO(CSV.encode()), 'clientes.csv')},
+                       content_type='multipart/form-data')
+
+
+def test_import_hashes_with_app_hasher(app, seeded, monkeypatch):
+    hasher = app.extensions['nova_hasher']
+    calls = []
+    hash_one = hasher.hash
+    monkeypatch.setattr(hasher, 'hash', lambda password: calls.append(password) or hash_one(password))
+
+    assert _upload(login(app.test_client(), 'admin@nova.test')).status_code == 302
+    assert sorted(calls) == [f'clave{i}123' for i in range(3)]
+    assert post_login(app.test_client(), 'importado1@nova.test', 'clave1123').status_code == 302
+
+
+def test_concurrent_registration_discards_batch(app, seeded, monkeypatch):
+    allocate = member_io.asignar_client_ids
+
+    def register_first(cantidad):
+        # Alguien se registra con uno de los correos entre la consulta y el INSERT
+        monkeypatch.setattr(member_io, 'asignar_client_ids', allocate)
+        with db.engine.begin() as conn:
+            conn.execute(insert(User).values(client_id='99999999', nombre='Otro', email='importado1@nova.test',
+                                             password_hash='!', role='user'))
+        return allocate(cantidad)
+
+    monkeypatch.setattr(member_io, 'asignar_client_ids', register_first)
+    client = login(app.test_client(), 'admin@nova.test')
+    assert _upload(client).status_code == 302
+    with app.app_context():
+        assert User.query.filter(User.email.like('importado%')).count() == 1
+
+    # Reimportar completa lo que faltó
+    assert _upload(client).status_code == 302
+    with app.app_context():
+        assert User.query.filter(User.email.like('importado%')).count() == 3
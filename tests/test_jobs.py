@@ -0,0 +1,177 @@
+# ==========================
+# tests/test_jobs.py
+# ==========================
+
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from conftest import ROUTINES_PER_USER
+from jobs import (JOB_LOCK_TIMEOUT, RETRY_BASE_SECONDS, SCHEDULE, _enqueue_once, claim_jobs,
+                  enqueue, run_pending, schedule_periodic, task)
+from models import db, CheckIn, Job, Routine, User
+from notifications import NotificationError
+
+
+def test_periodic_job_enqueued_once_across_workers(app):
+    with app.app_context():
+        # Dos workers que pasaron la comprobación a la vez
+        assert _enqueue_once('subscription_reminders', datetime.utcnow())
+        assert not _enqueue_once('subscription_reminders', datetime.utcnow())
+
+        schedule_periodic()
+        schedule_periodic()
+        for name, _ in SCHEDULE:
+            assert Job.query.filter_by(name=name, status='pending').count() == 1
+
+
+def _expire_in(user, days, phone='3001234567'):
+    user.phone = phone
+    user.subscription_date = date.today()
+    user.subscription_days = days
+
+
+def _run_all():
+    while run_pending():
+        pass
+
+
+def test_reminders_cover_the_whole_window_once(app, seeded):
+    with app.app_context():
+        members = [db.session.get(User, uid) for uid in seeded['members'][:4]]
+        _expire_in(members[0], 1)
+        _expire_in(members[1], 2)  # el día exacto ya pasó: la tarea no corrió
+        _expire_in(members[2], 3)
+        _expire_in(members[3], 10)
+        db.session.commit()
+        sent = app.extensions['nova_notifier'].sent
+
+        _run_all()
+        assert len(sent) == 3
+
+        # Otra corrida (p. ej. al día siguiente) no repite avisos
+        Job.query.delete()
+        db.session.commit()
+        _run_all()
+        assert len(sent) == 3
+
+        # Si renueva, el nuevo vencimiento se avisa de nuevo
+        members[0].subscription_days = 3
+        db.session.commit()
+        Job.query.delete()
+        db.session.commit()
+        _run_all()
+        assert len(sent) == 4
+
+
+@task('test_flaky', max_attempts=3)
+def _flaky(payload):
+    raise RuntimeError('falla')
+
+
+def test_claim_takes_each_job_once(app):
+    with app.app_context():
+        enqueue('test_flaky')
+        enqueue('test_flaky')
+        db.session.commit()
+
+        first = claim_jobs(1, 'w1')
+        second = claim_jobs(10, 'w2')
+        assert len(first) == len(second) == 1
+        assert first[0].id != second[0].id
+        assert first[0].status == 'running' and first[0].attempts == 1
+        assert claim_jobs(10, 'w3') == []
+
+
+def test_failed_job_backs_off_then_fails(app):
+    with app.app_context():
+        job = enqueue('test_flaky')
+        db.session.commit()
+
+        for attempt in (1, 2):
+            before = datetime.utcnow()
+            run_pending()
+            db.session.refresh(job)
+            assert job.status == 'pending' and job.attempts == attempt
+            wait = RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+            assert job.run_at >= before + timedelta(seconds=wait)
+            assert 'falla' in job.last_error
+            # No se reintenta antes de tiempo
+            run_pending()
+            db.session.refresh(job)
+            assert job.attempts == attempt
+            job.run_at = datetime.utcnow()
+            db.session.commit()
+
+        run_pending()
+        db.session.refresh(job)
+        assert job.status == 'failed' and job.attempts == 3
+        assert job.finished_at is not None
+
+
+def test_stale_running_job_is_requeued(app):
+    with app.app_context():
+        job = enqueue('subscription_reminders')
+        job.status, job.locked_by = 'running', 'muerto'
+        job.locked_at = datetime.utcnow() - JOB_LOCK_TIMEOUT - timedelta(minutes=1)
+        fresh = enqueue('rebuild_analytics_counters')
+        fresh.status, fresh.locked_by, fresh.locked_at = 'running', 'vivo', datetime.utcnow()
+        db.session.commit()
+
+        run_pending()
+        db.session.refresh(job)
+        db.session.refresh(fresh)
+        assert job.status == 'done' and job.attempts == 1
+        assert fresh.status == 'running' and fresh.locked_by == 'vivo'
+
+
+def test_reminders_retry_only_failed_members(app, seeded, monkeypatch):
+    with app.app_context():
+        ok, failing = [db.session.get(User, uid) for uid in seeded['members'][:2]]
+        _expire_in(ok, 2)
+        _expire_in(failing, 2, phone='3009999999')
+        db.session.commit()
+        transport = app.extensions['nova_notifier']
+        send = transport.send
+
+        def flaky_send(to, message):
+            if to.endswith('3009999999'):
+                raise NotificationError('sin servicio')
+            send(to, message)
+
+        monkeypatch.setattr(transport, 'send', flaky_send)
+        _run_all()
+        assert [to for to, _ in transport.sent] == ['573001234567']
+
+        retry = Job.query.filter_by(name='send_reminders', status='pending').one()
+        assert json.loads(retry.payload) == {'user_ids': [failing.id], 'round': 2}
+        assert retry.run_at > datetime.utcnow()
+        assert db.session.get(User, failing.id).reminder_sent_for is None
+
+        monkeypatch.setattr(transport, 'send', send)
+        retry.run_at = datetime.utcnow()
+        db.session.commit()
+        _run_all()
+        assert [to for to, _ in transport.sent] == ['573001234567', '573009999999']
+        assert db.session.get(User, failing.id).reminder_sent_for == date.today() + timedelta(days=2)
+
+
+@pytest.mark.parametrize('app_config', [{'MEMBER_RETENTION_DAYS': 30}], indirect=True)
+def test_cleanup_expired_members(app, seeded):
+    with app.app_context():
+        old, recent = [db.session.get(User, uid) for uid in seeded['members'][:2]]
+        old_id, recent_id = old.id, recent.id
+        old.subscription_date, old.subscription_days = date.today() - timedelta(days=70), 30
+        recent.subscription_date, recent.subscription_days = date.today() - timedelta(days=40), 30
+        db.session.add(CheckIn(user_id=old_id, created_at=datetime.utcnow()))
+        db.session.commit()
+        db.session.expunge_all()
+
+        _run_all()
+        assert db.session.get(User, old_id) is None
+        assert Routine.query.filter_by(user_id=old_id).count() == 0
+        assert CheckIn.query.filter_by(user_id=old_id).count() == 0
+        assert db.session.get(User, recent_id) is not None
+        assert Routine.query.filter_by(user_id=recent_id).count() == ROUTINES_PER_USER
+        assert Job.query.filter_by(name='cleanup_expired_members', status='done').count() == 1
@@ -0,0 +1,25 @@
+# ==========================
+# tests/test_login_limits.py
+# ==========================
+
+import pytest
+
+from conftest import post_login
+
+
+def test_shared_ip_is_not_limited_by_default(app, seeded):
+    # Hora pico: muchos clientes entran desde el mismo Wi-Fi
+    for i in range(60):
+        client = app.test_client()
+        response = post_login(client, f'cliente{i % 10}@nova.test')
+        assert response.status_code == 302
+
+
+@pytest.mark.parametrize('app_config', [{'LOGIN_RATE_LIMIT_IP': 2, 'PROXY_FIX_X_FOR': 1}], indirect=True)
+def test_ip_limit_uses_forwarded_address_behind_proxy(app, seeded):
+    def attempt(ip):
+        return post_login(app.test_client(), 'cliente0@nova.test', 'incorrecta',
+                          headers={'X-Forwarded-For': ip}).status_code
+
+    assert [attempt('10.0.0.1') for _ in range(3)] == [200, 200, 429]
+    assert attempt('10.0.0.2') == 200
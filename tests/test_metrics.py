@@ -0,0 +1,28 @@
+# ==========================
+# tests/test_metrics.py
+# ==========================
+
+import pytest
+
+
+METRICS = {'METRICS_ENABLED': True, 'METRICS_TOKEN': 'secreto-metricas'}
+
+
+@pytest.mark.parametrize('app_config', [METRICS], indirect=True)
+def test_metrics_token(app):
+    client = app.test_client()
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secreto-metricas'}).status_code == 200
+    assert client.get('/metrics', headers={'Authorization': 'Bearer otro'}).status_code == 403
+    assert client.get('/metrics').status_code == 403
+
+
+@pytest.mark.parametrize('app_config', [METRICS], indirect=True)
+def test_failed_request_is_recorded_as_500(app):
+    @app.route('/falla')
+    def falla():
+        raise RuntimeError('falla')
+
+    with pytest.raises(RuntimeError):
+        app.test_client().get('/falla')
+    rendered = app.extensions['nova_metrics'].render()
+    assert 'nova_http_requests_total{endpoint="falla",method="GET",status="500"} 1' in rendered
@@ -0,0 +1,39 @@
+# ==========================
+# tests/test_passwords.py
+# ==========================
+
+from werkzeug.security import generate_password_hash
+
+from passwords import PasswordHasher
+
+
+METHOD = 'pbkdf2:sha256:1000'
+
+
+def test_needs_rehash_on_salt_length_change():
+    hasher = PasswordHasher(method=METHOD, salt_length=16, workers=0)
+    assert not hasher.needs_rehash(generate_password_hash('x', METHOD, 16))
+    assert hasher.needs_rehash(generate_password_hash('x', METHOD, 8))
+    assert hasher.needs_rehash(generate_password_hash('x', 'pbkdf2:sha256:2000', 16))
+
+
+def test_recovers_from_broken_pool():
+    hasher = PasswordHasher(method=METHOD, workers=1)
+    try:
+        pwhash = hasher.hash('secreto')
+        for process in list(hasher._pool._processes.values()):
+            process.kill()
+            process.join()
+        assert hasher.verify(pwhash, 'secreto')
+        assert hasher.verify(pwhash, 'otra') is False
+    finally:
+        hasher.shutdown()
+
+
+def test_shutdown_stops_pool_processes():
+    hasher = PasswordHasher(method=METHOD, workers=1)
+    hasher.hash('secreto')
+    processes = list(hasher._pool._processes.values())
+    hasher.shutdown()
+    assert hasher._pool is None
+    assert not any(p.is_alive() for p in processes)
@@ -0,0 +1,55 @@
+# ==========================
+# tests/test_query_budgets.py
+# ==========================
+# Cada endpoint de SQL_QUERY_BUDGETS se pide con SQL_QUERY_BUDGET_ENFORCE
+# activo: si una vista vuelve a hacer una consulta por rutina o por
+# ejercicio (N+1), check_query_budget lanza AssertionError y la prueba falla.
+
+import pytest
+
+from conftest import login
+
+
+MEMBER_URLS = {
+    'dashboard': '/dashboard',
+    'mis_rutinas': '/mis_rutinas',
+    'view_routine': '/routine/{routine}',
+    'api_v1.me_routines': '/api/v1/me/routines?fields=id,titulo,exercises',
+    'api_v1.me_routine_changes': '/api/v1/me/routines/changes?since=2000-01-01T00:00:00',
+    'api_v1.routine_detail': '/api/v1/routines/{routine}',
+}
+
+ADMIN_URLS = {
+    'admin_user_detail': '/admin/user/{member}',
+    'admin_edit_routine': '/admin/routine/{routine}/edit',
+    'admin_analytics': '/admin/analytics',
+}
+
+
+def _url(template, seeded):
+    return template.format(routine=seeded['routine'], member=seeded['members'][0])
+
+
+def test_every_budget_is_covered(app):
+    assert set(app.config['SQL_QUERY_BUDGETS']) == set(MEMBER_URLS) | set(ADMIN_URLS)
+
+
+@pytest.mark.parametrize('endpoint', sorted(MEMBER_URLS))
+def test_member_endpoint_within_budget(app, seeded, endpoint):
+    client = login(app.test_client(), 'cliente0@nova.test')
+    response = client.get(_url(MEMBER_URLS[endpoint], seeded))
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('endpoint', sorted(ADMIN_URLS))
+def test_admin_endpoint_within_budget(app, seeded, endpoint):
+    client = login(app.test_client(), 'admin@nova.test')
+    response = client.get(_url(ADMIN_URLS[endpoint], seeded))
+    assert response.status_code == 200
+
+
+def test_exceeding_budget_fails(app, seeded):
+    client = login(app.test_client(), 'cliente0@nova.test')
+    app.config['SQL_QUERY_BUDGETS']['mis_rutinas'] = 1
+    with pytest.raises(AssertionError, match='mis_rutinas ejecutó'):
+        client.get('/mis_rutinas')
@@ -0,0 +1,35 @@
+# ==========================
+# tests/test_templates.py
+# ==========================
+
+from conftest import login
+from models import db, Exercise, Routine
+
+
+def _template_routine(app, seeded):
+    with app.app_context():
+        r = Routine.query.filter(Routine.user_id == seeded['members'][0],
+                                 Routine.template_id.isnot(None)).one()
+        return r.id, r.template.exercises[0].id
+
+
+def test_partial_overrides_accumulate(app, seeded):
+    rid, teid = _template_routine(app, seeded)
+    client = login(app.test_client(), 'admin@nova.test')
+    url = f'/admin/routine/{rid}/template-exercise/{teid}'
+
+    assert client.post(url, json={'peso': '20kg'}).get_json()['ok']
+    assert client.post(url, json={'series': 5}).get_json()['ok']
+
+    with app.app_context():
+        override = Exercise.query.filter_by(rutina_id=rid, template_exercise_id=teid).one()
+        assert (override.peso, override.series, override.nombre) == ('20kg', 5, 'Ejercicio 0')
+
+
+def test_override_rejects_invalid_fields(app, seeded):
+    rid, teid = _template_routine(app, seeded)
+    client = login(app.test_client(), 'admin@nova.test')
+    response = client.post(f'/admin/routine/{rid}/template-exercise/{teid}', json={'series': 'x'})
+    assert response.status_code == 400
+    with app.app_context():
+        assert db.session.query(Exercise).filter_by(template_exercise_id=teid).count() == 0
@@ -0,0 +1,33 @@
+# ==========================
+# tests/test_user_search.py
+# ==========================
+
+from sqlalchemy import update
+
+from conftest import login
+from models import db, User
+
+
+def test_search_pages_through_members_without_created_at(app, seeded):
+    undated = seeded['members'][:3]
+    with app.app_context():
+        db.session.execute(update(User).where(User.id.in_(undated)).values(created_at=None))
+        db.session.commit()
+    client = login(app.test_client(), 'admin@nova.test')
+
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 4, **({'cursor': cursor} if cursor else {})}
+        data = client.get('/admin/users/search', query_string=params).get_json()
+        assert data['ok']
+        seen += [(u['id'], u['created_at']) for u in data['users']]
+        cursor = data['next_cursor']
+        if cursor is None:
+            break
+
+    assert sorted(uid for uid, _ in seen) == sorted(seeded['members'])
+    # Los que no tienen fecha van al final, sin fecha en el JSON
+    assert seen[-3:] == [(uid, None) for uid in sorted(undated, reverse=True)]
+
+    assert client.get('/admin').status_code == 200
+    assert client.get(f'/admin/user/{undated[0]}').status_code == 200